@@ -1,15 +1,47 @@
 """Simple quiz game."""
 
 
+import asyncio
+import fcntl
+import hashlib
 import json
 import logging
+import math
+import os
 import random
-from argparse import ArgumentParser, Namespace
+import struct
+import threading
+import time
+from argparse import ArgumentParser, ArgumentTypeError, Namespace
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from itertools import count, repeat
+from statistics import quantiles
 from sys import argv, exit
-from typing import Annotated, Optional
+from typing import Annotated, Iterable, Iterator, Optional, Sequence
 
+from jsonschema import Draft4Validator
 from validator_collection import errors, validators
 
+ROUNDS = 10
+# pre-generated games kept for each level
+DECK_GAMES = 1000
+DECK_REFILL_AT = 250
+# magic, level, rounds, bank version, questions file mtime_ns and size,
+# games, next game to claim
+DECK_HEADER = struct.Struct("<4sBBIQQII")
+# question hash, the 4 variants (0 is the good answer), good answer index
+DECK_ROUND = struct.Struct("<32s4BB")
+_deck_refills: set[int] = set()
+# adaptive games: Elo ratings of players and questions
+START_RATING = 1500
+LEVEL_STEP = 100
+BUCKET_SIZE = 50
+TARGET_CORRECT = 0.7
+# seconds the background writer waits to save more edits at once
+WRITE_DELAY = 0.1
+
 
 def main():
     """Main function."""
@@ -25,20 +57,71 @@ def main():
         args = parse_args()
 
     logging.debug("Returned form parsing args: %s", args)
+    try:
+        # edits are saved in the background and flushed before quitting
+        with QuestionBank(write_behind=True) as bank:
+            run_action(args, bank)
+    except QuestionBankError as err:
+        logging.debug(err.__cause__)
+        logging.critical(err)
+        exit("Quit because of fatal error")
+
+
+def run_action(args: Namespace, bank: "QuestionBank") -> None:
+    """Run the action selected in the CLI on `bank`."""
     match args.action:
         case "play":
-            logging.debug("Send to play game function: %s", args.level)
-            play_game(args.level)
+            if args.adaptive:
+                logging.debug(
+                    "Send to play adaptive function: %s", args.player)
+                play_adaptive(args.player, bank)
+                return
+            logging.debug("Send to play game function: %s %s %s %s",
+                          args.level, args.category, args.deck, args.seed)
+            play_game(args.level, args.category, args.deck,
+                      args.seed, args.record, bank)
         case "list":
-            logging.debug("Sent to list questions function")
-            list_questions()
+            logging.debug(
+                "Sent to list questions function: %s", args.category)
+            list_questions(args.category, bank)
         case "add":
             logging.debug("Sent to add question function")
-            add_question()
+            add_question(bank)
         case "delete":
             logging.debug(
                 "Send to delete question function: %s", args.question_no)
-            delete_question(args.question_no)
+            delete_question(args.question_no, bank)
+        case "validate":
+            logging.debug(
+                "Send to validate questions function: %s", args.jobs)
+            if not validate_questions(bank.filename, args.jobs,
+                                      args.chunk_size, bank.schema_file):
+                exit(f"There is invalid data in '{bank.filename}'")
+        case "history":
+            logging.debug("Sent to show history function")
+            show_history(bank.filename)
+        case "diff":
+            logging.debug(
+                "Send to diff versions function: %s %s", args.old, args.new)
+            diff_versions(args.old, args.new, bank.filename)
+        case "rollback":
+            logging.debug("Send to rollback function: %s", args.version)
+            rollback(args.version, bank)
+        case "deck":
+            logging.debug("Send to build deck function: %s %s",
+                          args.level, args.games)
+            for level in [args.level] if args.level else range(1, 4):
+                build_deck(level, args.games, bank)
+                print(f"Built {args.games} games for level {level}")
+        case "replay":
+            logging.debug("Send to replay function: %s", args.replays)
+            if not replay_games(args.replays, bank):
+                exit("Replayed scores don't match")
+        case "loadtest":
+            logging.debug("Send to load test function: %s %s",
+                          args.players, args.mode)
+            load_test(args.players, args.mode, args.think_time,
+                      args.games, args.level, bank)
 
 
 def parse_args(
@@ -57,10 +140,40 @@ def parse_args(
         type=int,
         choices=range(1, 4),
         default="1")
+    play_source = parser_play.add_mutually_exclusive_group()
+    play_source.add_argument(
+        "-c", "--category",
+        help="Play only questions from this category or tag",
+        default=None)
+    play_source.add_argument(
+        "-d", "--deck",
+        help="Play a game generated in advance (see deck)",
+        action="store_true")
+    play_source.add_argument(
+        "-a", "--adaptive",
+        help="Choose the level and questions based on your skill",
+        action="store_true")
+    parser_play.add_argument(
+        "-p", "--player",
+        help="Player name used to keep the skill rating (default player)",
+        default="player")
+    parser_play.add_argument(
+        "-s", "--seed",
+        help="Play the same game every time for the same seed",
+        type=int,
+        default=None)
+    parser_play.add_argument(
+        "-r", "--record",
+        help="Append the game to this replay file",
+        default=None)
 
-    subparsers.add_parser(
+    parser_list = subparsers.add_parser(
         name="list",
         help="List all the questions in the game")
+    parser_list.add_argument(
+        "-c", "--category",
+        help="List only questions from this category or tag",
+        default=None)
 
     subparsers.add_parser(
         name="add",
@@ -74,67 +187,242 @@ def parse_args(
         help="Question number to detele (first list questions)",
         type=int)
 
-    return parser.parse_args(args)
+    parser_validate = subparsers.add_parser(
+        name="validate",
+        help="Validate all the questions and report every invalid one")
+    parser_validate.add_argument(
+        "-j", "--jobs",
+        help="Number of worker processes (default: number of CPUs)",
+        type=positive_int,
+        default=None)
+    parser_validate.add_argument(
+        "-c", "--chunk-size",
+        help="Questions validated by a worker at a time (default 500)",
+        type=positive_int,
+        default=500)
+
+    subparsers.add_parser(
+        name="history",
+        help="List all the saved versions of the questions")
+
+    parser_diff = subparsers.add_parser(
+        name="diff",
+        help="Show the questions changed between two versions")
+    parser_diff.add_argument(
+        "old",
+        help="Version to compare from (first list history)",
+        type=int)
+    parser_diff.add_argument(
+        "new",
+        help="Version to compare to (default: latest version)",
+        type=int,
+        nargs="?",
+        default=None)
+
+    parser_rollback = subparsers.add_parser(
+        name="rollback",
+        help="Restore the questions saved in a previous version")
+    parser_rollback.add_argument(
+        "version",
+        help="Version to restore (first list history)",
+        type=int)
+
+    parser_deck = subparsers.add_parser(
+        name="deck",
+        help="Generate games in advance for faster game start")
+    parser_deck.add_argument(
+        "-l", "--level",
+        help="Game level: 1(easy) - 3(hard) (default: all levels)",
+        type=int,
+        choices=range(1, 4),
+        default=None)
+    parser_deck.add_argument(
+        "-g", "--games",
+        help=f"Number of games to generate (default {DECK_GAMES})",
+        type=positive_int,
+        default=DECK_GAMES)
+
+    parser_loadtest = subparsers.add_parser(
+        name="loadtest",
+        help="Measure how many games can be played at the same time")
+    parser_loadtest.add_argument(
+        "-p", "--players",
+        help="Number of virtual players (default 100)",
+        type=positive_int,
+        default=100)
+    parser_loadtest.add_argument(
+        "-m", "--mode",
+        help="Run the players in threads, asyncio tasks or processes",
+        choices=("thread", "asyncio", "process"),
+        default="thread")
+    parser_loadtest.add_argument(
+        "-t", "--think-time",
+        help="Average seconds a player thinks before answering (default 0)",
+        type=float,
+        default=0.0)
+    parser_loadtest.add_argument(
+        "-g", "--games",
+        help="Games played by each player (default 1)",
+        type=positive_int,
+        default=1)
+    parser_loadtest.add_argument(
+        "-l", "--level",
+        help="Game level: 1(easy) - 3(hard) (default: random level)",
+        type=int,
+        choices=range(1, 4),
+        default=None)
+
+    parser_replay = subparsers.add_parser(
+        name="replay",
+        help="Replay recorded games and check their scores")
+    parser_replay.add_argument(
+        "replays",
+        help="Replay file (see play --record)")
+
+    namespace = parser.parse_args(args)
+    if namespace.action == "play" and (
+            namespace.deck or namespace.adaptive) and (
+            namespace.seed is not None or namespace.record):
+        parser_play.error(
+            f"argument {'-d/--deck' if namespace.deck else '-a/--adaptive'}"
+            ": not allowed with argument -s/--seed or -r/--record")
+    return namespace
 
 
-def play_game(level: Annotated[int, range(1, 4)]) -> None:
+def positive_int(value: str) -> int:
+    """Argparse type for integers of at least 1."""
+    try:
+        number = int(value)
+    except ValueError as err:
+        raise ArgumentTypeError(f"invalid int value: {value!r}") from err
+    if number < 1:
+        raise ArgumentTypeError(f"must be at least 1: {value!r}")
+    return number
+
+
+def play_game(
+        level: Annotated[int, range(1, 4)],
+        category: Optional[str] = None,
+        deck: bool = False,
+        seed: Optional[int] = None,
+        record: Optional[str] = None,
+        bank: Optional["QuestionBank"] = None) -> None:
     """Start the game with difficulty set at `level`."""
     logging.info("Start game with level: %s", level)
+    bank = bank or QuestionBank()
 
-    ROUNDS = 10
-
-    questions = open_json()
-    if len(questions) < ROUNDS:
-        exit("Not enough questions")
+    version = None
+    if record:
+        if seed is None:
+            seed = random.randrange(2**32)
+        # the replay is checked against the version saved with it
+        bank.flush()
+    rng = random.Random(seed) if seed is not None else None
+    if deck:
+        rounds = claim_game(level, bank)
+    else:
+        if category:
+            # read only the questions from the category
+            record_hashes = [record_hash for _, record_hash
+                             in category_questions(category, bank)]
+            questions = [read_question(record_hash, bank.filename)
+                         for record_hash in sample_hashes(record_hashes, rng)]
+            if record:
+                # the category index matches the latest version
+                version = head_version(bank.filename)
+        else:
+            questions = bank.load()
+            if record:
+                # the first recorded game creates the history
+                version = snapshot_file(questions, bank.filename)
+        if len(questions) < ROUNDS:
+            raise NotEnoughQuestionsError("Not enough questions")
+        rounds = draw_game(questions, level, rng)
+    answers = ""
 
     score = 0
 
     def print_score() -> None:
+        if record:
+            save_replay(record, seed, level, category, answers, score,
+                        version)
         print(f"\nFinal score: {score}")
         print(f"Difficulty level: {level}/3")
-        if score == 10:
-            print("Perfect game!!!")
-        elif score >= 8:
-            print("Good game")
-        elif score == 7:
-            print("Pretty good game")
-        elif score >= 5:
-            print("Maybe you can do better")
-        elif score >= 3:
-            print("Have another try")
-        elif score >= 1:
-            print("You really should have another try")
-        else:
-            print("Are you even trying?")
+        print(score_message(score))
 
     for round_no in range(1, ROUNDS + 1):
         # print the question
         print(f"\nQuestion {round_no}/{ROUNDS}")
-        question = questions.pop(random.randint(0, len(questions) - 1))
+        question, variants = rounds[round_no - 1]
         print(question["name"])
         logging.debug(question["name"])
         # print the variants
-        variants: list = (question["answ_bad"][level-1:level+2] +
-                          [question["answ_good"]])
-        random.shuffle(variants)
         for poz, variant in enumerate(variants):
             print(f"({poz + 1}) {variant}")
         # logging correct answer
         logging.debug(variants.index(question["answ_good"]) + 1)
 
         # get answer from user
-        while True:
-            answer = input("Your answer (1, 2, 3 or 4): ").lower()
-            if answer in {"1", "2", "3", "4", "quit"}:
-                if answer == "quit":
-                    print_score()
-                    exit("Game ended")
-                break
-            else:
-                print("Enter '1', '2', '3' or '4'.\nEnter 'quit' to quit game")
+        answer = ask_answer()
+        if answer == "quit":
+            print_score()
+            exit("Game ended")
 
         # check answer
-        if variants[int(answer) - 1] == question["answ_good"]:
+        answers += answer
+        if check_answer(question, variants, int(answer)):
+            score += 1
+            print("✅ Good job!")
+        else:
+            print(f"❗️ Sorry, the correct answer was {question['answ_good']}")
+        logging.info("Score: %s", score)
+
+    print_score()
+
+
+def play_adaptive(
+        player: str = "player",
+        bank: Optional["QuestionBank"] = None) -> None:
+    """Play a game choosing each level and question for `player`."""
+    logging.info("Start adaptive game: %s", player)
+    bank = bank or QuestionBank()
+    questions = bank.load()
+    if len(questions) < ROUNDS:
+        raise NotEnoughQuestionsError("Not enough questions")
+    by_hash = {question_hash(question): question for question in questions}
+    ratings = Ratings.load(bank.filename)
+    ratings.index_questions(by_hash)
+    print(f"Skill rating of {player}: {ratings.skill(player):.0f}")
+
+    score = 0
+    asked: set[str] = set()
+
+    def print_score() -> None:
+        ratings.save(bank.filename)
+        print(f"\nFinal score: {score}")
+        print(f"Skill rating of {player}: {ratings.skill(player):.0f}")
+        print(score_message(score))
+
+    for round_no in range(1, ROUNDS + 1):
+        level, record_hash = ratings.next_question(player, asked)
+        asked.add(record_hash)
+        question = by_hash[record_hash]
+        variants = make_variants(question, level)
+        print(f"\nQuestion {round_no}/{ROUNDS} (level {level}/3)")
+        print(question["name"])
+        logging.debug(question["name"])
+        for poz, variant in enumerate(variants):
+            print(f"({poz + 1}) {variant}")
+        logging.debug(variants.index(question["answ_good"]) + 1)
+
+        answer = ask_answer()
+        if answer == "quit":
+            print_score()
+            exit("Game ended")
+
+        correct = check_answer(question, variants, int(answer))
+        ratings.update(player, record_hash, level, correct)
+        if correct:
             score += 1
             print("✅ Good job!")
         else:
@@ -144,18 +432,205 @@ def play_game(level: Annotated[int, range(1, 4)]) -> None:
     print_score()
 
 
-def list_questions() -> None:
-    """List all questions indexed."""
-    logging.info("List all questions")
-    questions = open_json()
+def ask_answer() -> str:
+    """Ask for an answer until it's '1', '2', '3', '4' or 'quit'."""
+    while True:
+        answer = input("Your answer (1, 2, 3 or 4): ").lower()
+        if answer in {"1", "2", "3", "4", "quit"}:
+            return answer
+        print("Enter '1', '2', '3' or '4'.\nEnter 'quit' to quit game")
+
+
+def score_message(score: int) -> str:
+    """Return the message for the final `score`."""
+    if score == 10:
+        return "Perfect game!!!"
+    if score >= 8:
+        return "Good game"
+    if score == 7:
+        return "Pretty good game"
+    if score >= 5:
+        return "Maybe you can do better"
+    if score >= 3:
+        return "Have another try"
+    if score >= 1:
+        return "You really should have another try"
+    return "Are you even trying?"
+
+
+def sample_hashes(
+        record_hashes: list[str],
+        rng: Optional[random.Random] = None) -> list[str]:
+    """Return up to `ROUNDS` random question hashes from a category."""
+    return (rng or random).sample(
+        record_hashes, min(ROUNDS, len(record_hashes)))
+
+
+def draw_questions(
+        questions: Sequence[dict[str, str | list]],
+        rng: Optional[random.Random] = None) -> list[dict[str, str | list]]:
+    """Return `ROUNDS` random questions for a game."""
+    return (rng or random).sample(questions, ROUNDS)
+
+
+def make_variants(
+        question: dict[str, str | list],
+        level: Annotated[int, range(1, 4)],
+        rng: Optional[random.Random] = None) -> list[str]:
+    """Return the shuffled answers of `question` for `level`."""
+    variants: list = (question["answ_bad"][level-1:level+2] +
+                      [question["answ_good"]])
+    (rng or random).shuffle(variants)
+    return variants
+
+
+def draw_game(
+        questions: Sequence[dict[str, str | list]],
+        level: Annotated[int, range(1, 4)],
+        rng: Optional[random.Random] = None) -> list[tuple[dict, list[str]]]:
+    """Return the (question, variants) of each round of a game."""
+    return [(question, make_variants(question, level, rng))
+            for question in draw_questions(questions, rng)]
+
+
+def check_answer(
+        question: dict[str, str | list],
+        variants: list[str],
+        answer: Annotated[int, range(1, 5)]) -> bool:
+    """Return True if variant number `answer` is the correct answer."""
+    return variants[answer - 1] == question["answ_good"]
+
+
+def save_replay(
+        filename: str,
+        seed: int,
+        level: Annotated[int, range(1, 4)],
+        category: Optional[str],
+        answers: str,
+        score: int,
+        version: Optional[int] = None) -> None:
+    """Append a game to the replay file `filename`."""
+    replay = {"seed": seed, "version": version, "level": level,
+              "answers": answers, "score": score}
+    if category:
+        replay["category"] = category
+    with open(filename, "a", encoding="UTF-8") as replay_file:
+        replay_file.write(json.dumps(replay, separators=(",", ":")) + "\n")
+    logging.info("Saved replay: %s", replay)
+
+
+def replay_games(
+        replays: str,
+        bank: Optional["QuestionBank"] = None) -> bool:
+    """Replay every game in `replays` and check the recorded scores."""
+    logging.info("Replay games: %s", replays)
+    bank = bank or QuestionBank()
+    filename = bank.filename
+    # questions of each version and of each category in a version
+    versions: dict[Optional[int], list[str]] = {}
+    pools: dict[tuple[Optional[int], Optional[str]], list] = {}
+    by_hash: dict[str, dict[str, str | list]] = {}
+    games = mismatches = 0
+    start_time = time.perf_counter()
+
+    def version_hashes(version: Optional[int]) -> list[str]:
+        if version not in versions:
+            if version is None:
+                # replays recorded without a version use the current file
+                questions = bank.load()
+                versions[None] = [question_hash(question)
+                                  for question in questions]
+                by_hash.update(zip(versions[None], questions))
+            elif manifest := read_manifest(version, filename):
+                versions[version] = manifest["records"]
+            else:
+                exit(f"Version {version} not found")
+        return versions[version]
+
+    def stored_question(record_hash: str) -> dict[str, str | list]:
+        if record_hash not in by_hash:
+            try:
+                by_hash[record_hash] = read_question(record_hash, filename)
+            except FileNotFoundError as err:
+                logging.debug(err)
+                exit(f"Stored question {record_hash} not found")
+        return by_hash[record_hash]
+
+    try:
+        with open(replays, encoding="UTF-8") as replay_file:
+            # one game at a time, so any file size can be replayed
+            for line_no, line in enumerate(replay_file, start=1):
+                if not line.strip():
+                    continue
+                replay = json.loads(line)
+                answers = replay["answers"]
+                if (replay["level"] not in range(1, 4) or
+                        not isinstance(answers, str) or
+                        len(answers) > ROUNDS or set(answers) - set("1234")):
+                    raise ValueError(f"Incorrect level or answers: {replay}")
+                version = replay.get("version")
+                category = replay.get("category")
+                rng = random.Random(replay["seed"])
+                if (version, category) not in pools:
+                    record_hashes = version_hashes(version)
+                    if category:
+                        key = _category_key(category)
+                        record_hashes = [
+                            record_hash for record_hash in record_hashes
+                            if key in _question_categories(
+                                stored_question(record_hash))]
+                    pools[version, category] = record_hashes
+                if category:
+                    game_questions = [
+                        stored_question(record_hash) for record_hash
+                        in sample_hashes(pools[version, category], rng)]
+                else:
+                    game_questions = [stored_question(record_hash)
+                                      for record_hash in pools[version, None]]
+                score = sum(
+                    check_answer(question, variants, int(answer))
+                    for (question, variants), answer in zip(
+                        draw_game(game_questions, replay["level"], rng),
+                        answers))
+                games += 1
+                if score != replay["score"]:
+                    mismatches += 1
+                    print(f"{line_no:>6} - recorded score "
+                          f"{replay['score']}, replayed score {score}")
+    except FileNotFoundError as err:
+        logging.debug(err)
+        exit(f"File '{replays}' not found")
+    except (json.JSONDecodeError, KeyError, TypeError, ValueError) as err:
+        logging.debug(err)
+        exit(f"Line {line_no} of '{replays}' is not a correct replay")
+    elapsed = time.perf_counter() - start_time
+    print(f"Replayed {games} games in {elapsed:.3f}s "
+          f"({games / max(elapsed, 1e-9):.0f} games/s), "
+          f"{mismatches} mismatches")
+    return not mismatches
+
+
+def list_questions(
+        category: Optional[str] = None,
+        bank: Optional["QuestionBank"] = None) -> None:
+    """List all questions (or only the ones in `category`) indexed."""
+    logging.info("List all questions: %s", category)
+    bank = bank or QuestionBank()
+    if category:
+        for poz, record_hash in category_questions(category, bank):
+            question = read_question(record_hash, bank.filename)
+            print(f"{poz + 1:>4} - {question['name']}")
+        return
+    questions = bank.load()
     for poz, question in enumerate(questions):
         print(f"{poz + 1:>4} - {question['name']}")
         logging.debug("'%s' %s", question['answ_good'], question['answ_bad'])
 
 
-def add_question() -> None:
+def add_question(bank: Optional["QuestionBank"] = None) -> None:
     """Add a question to the file."""
     logging.info("Add a question")
+    bank = bank or QuestionBank()
     print("You need to provide:",
           "  - a question",
           "  - 1 correct answer",
@@ -191,92 +666,1445 @@ def add_question() -> None:
 
     logging.debug("New question to add: %s", question)
 
-    questions = open_json()
-    questions.append(question)
-    if save_json(questions):
+    try:
+        bank.add(question)
+    except BankValidationError as err:
+        logging.debug(err.__cause__)
+        print("Question not added... Try again")
+    else:
         print("Question added")
         logging.info("Added question: %s", question)
-    else:
-        print("Question not added... Try again")
 
 
-def delete_question(question_no: int) -> None:
+def delete_question(
+        question_no: int,
+        bank: Optional["QuestionBank"] = None) -> None:
     """Delete `question_no` from the file."""
     logging.info("Delete question: %s", question_no)
+    bank = bank or QuestionBank()
 
-    questions = open_json()
-    # validate question number and retrieve the index question
     try:
-        question_index = validators.integer(
-            question_no - 1,
-            minimum=0,
-            maximum=len(questions) - 1)
-    except errors.MinimumValueError:
-        logging.debug("%s < minimum allowed (0)", question_no)
-        exit("Minimum question number is 1")
-    except errors.MaximumValueError:
-        logging.debug("%s > maximum allowed (%s)", question_no, len(questions))
-        exit(f"Maximum question number is {len(questions)}")
+        question = bank.question(question_no)
+    except QuestionNumberError as err:
+        exit(str(err))
 
     # confirmation
     confirm = input(f"This will delete question number {question_no}:\n  " +
-                    questions[question_index]["name"].rstrip("?") +
+                    question["name"].rstrip("?") +
                     "\nAre you sure? (y)es: ")
     if confirm in {"yes", "y"}:
-        del questions[question_index]
-        if save_json(questions):
+        try:
+            bank.delete(question_no)
+        except BankValidationError as err:
+            logging.debug(err.__cause__)
+            print("Question was not deleted")
+        else:
             logging.info("Deleted question: %s", question_no)
             print("Question was deleted")
-        else:
-            print("Question was not deleted")
     else:
         print("Question was not deleted")
 
 
-def open_json(filename: str = "questions.json") -> list[dict[str, str | list]]:
+def open_json(
+        filename: str = "questions.json",
+        schema_file: str = "json_schema.json"
+        ) -> list[dict[str, str | list]]:
     """Open the question json file."""
-    logging.info("Opening json: %s", filename)
+    try:
+        return QuestionBank(filename, schema_file).load()
+    except QuestionBankError as err:
+        logging.debug(err.__cause__)
+        logging.critical(err)
+    exit("Quit because of fatal error")
+
+
+def validate_questions(
+        filename: str = "questions.json",
+        jobs: Optional[int] = None,
+        chunk_size: int = 500,
+        schema_file: str = "json_schema.json") -> bool:
+    """Validate every question in parallel chunks and report all errors."""
+    logging.info("Validating json: %s", filename)
+    if (jobs is not None and jobs < 1) or chunk_size < 1:
+        raise ValueError("jobs and chunk_size must be at least 1")
     try:
         with open(filename, encoding="UTF-8") as json_file:
             questions = json.load(json_file)
-        with open("json_schema.json", encoding="UTF-8") as schema_file:
-            schema = json.load(schema_file)
-        validators.json(questions, schema)
-        return questions
+        with open(schema_file, encoding="UTF-8") as json_file:
+            schema = json.load(json_file)
     except FileNotFoundError as err:
         logging.debug(err)
-        logging.critical("File '%s' not found", filename)
+        logging.critical("File '%s' not found", err.filename)
+        exit("Quit because of fatal error")
     except json.JSONDecodeError as err:
         logging.debug(err)
-        logging.critical("File '%s' is not a correct json file", filename)
-    except errors.JSONValidationError as err:
-        logging.debug(err)
-        logging.critical("There is invalid data in '%s'", filename)
-    exit("Quit because of fatal error")
+        print(f"File '{filename}' is not a correct json file: "
+              f"line {err.lineno}, column {err.colno}: {err.msg}")
+        return False
+    if not isinstance(questions, list):
+        print(f"File '{filename}' must contain an array of questions")
+        return False
+
+    start_time = time.perf_counter()
+    chunks = [(start, questions[start:start + chunk_size])
+              for start in range(0, len(questions), chunk_size)]
+    problems = []
+    if jobs == 1 or len(chunks) <= 1:
+        # not worth starting a process pool
+        for chunk in chunks:
+            problems.extend(_validate_chunk(schema["items"], chunk))
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            for chunk_problems in executor.map(
+                    _validate_chunk, repeat(schema["items"]), chunks):
+                problems.extend(chunk_problems)
+    problems.extend(_find_duplicate_questions(questions))
+    problems.sort(key=lambda problem: problem[0])
+    elapsed = time.perf_counter() - start_time
+
+    for index, path, schema_path, reason in problems:
+        print(f"{index + 1:>4} - {path} ({schema_path}): {reason}")
+    print(f"Checked {len(questions)} questions in {elapsed:.3f}s "
+          f"({len(questions) / max(elapsed, 1e-9):.0f} questions/s)")
+    if problems:
+        print(f"Found {len(problems)} problems in "
+              f"{len({problem[0] for problem in problems})} questions")
+    logging.info("Validation problems: %s", len(problems))
+    return not problems
+
+
+def validate_question(
+        question: dict[str, str | list],
+        validator: Draft4Validator) -> list[tuple[str, str, str]]:
+    """Return (path, schema path, reason) for each problem in `question`."""
+    problems = []
+    for err in validator.iter_errors(question):
+        path = "$" + "".join(f"[{key}]" if isinstance(key, int)
+                             else f".{key}" for key in err.absolute_path)
+        schema_path = "/".join(
+            ["items", *map(str, err.absolute_schema_path)])
+        problems.append((path, schema_path, err.message))
+    if (isinstance(question, dict) and
+            isinstance(question.get("answ_bad"), list) and
+            question.get("answ_good") in question["answ_bad"]):
+        problems.append((
+            "$.answ_bad", "answ_good-not-in-answ_bad",
+            f"{question['answ_good']!r} is both a good and a bad answer"))
+    return problems
+
+
+def _validate_chunk(
+        item_schema: dict,
+        chunk: tuple[int, list]) -> list[tuple[int, str, str, str]]:
+    """Validate a chunk of questions starting at index `chunk[0]`."""
+    start, questions = chunk
+    validator = Draft4Validator(item_schema)
+    return [(start + offset, *problem)
+            for offset, question in enumerate(questions)
+            for problem in validate_question(question, validator)]
+
+
+def _find_duplicate_questions(
+        questions: list) -> list[tuple[int, str, str, str]]:
+    """Find questions with the same name (ignoring case and spaces)."""
+    problems = []
+    seen: dict[str, int] = {}
+    for index, question in enumerate(questions):
+        if not isinstance(question, dict) or not isinstance(
+                question.get("name"), str):
+            continue
+        name = " ".join(question["name"].casefold().split())
+        if name in seen:
+            problems.append((
+                index, "$.name", "unique-name",
+                f"duplicate of question {seen[name] + 1}"))
+        else:
+            seen[name] = index
+    return problems
 
 
 def save_json(
         questions: list[dict[str, str | list]],
-        filename: str = "questions.json") -> Optional[bool]:
-    """Save questions to the json file."""
-    logging.info("Saving json: %s", filename)
+        filename: str = "questions.json",
+        message: str = "",
+        schema_file: str = "json_schema.json") -> Optional[bool]:
+    """Save questions to the json file and record a new version."""
     try:
-        with open("json_schema.json", encoding="UTF-8") as schema_file:
-            schema = json.load(schema_file)
-        validators.json(questions, schema)
-        with open(filename, "w+", encoding="UTF-8") as json_file:
-            json.dump(questions, json_file, indent=2)
+        QuestionBank(filename, schema_file).save(questions, message)
         return True
-    except FileNotFoundError as err:
+    except BankValidationError as err:
+        logging.debug(err.__cause__)
+        logging.critical(err)
+    except QuestionBankError as err:
+        logging.debug(err.__cause__)
+        logging.warning(err)
+    exit("Quit because of fatal error")
+
+
+def question_hash(question: dict[str, str | list]) -> str:
+    """Return the content hash used to store `question` once."""
+    return hashlib.sha256(json.dumps(
+        question, sort_keys=True, separators=(",", ":"),
+        ensure_ascii=False).encode("UTF-8")).hexdigest()
+
+
+def history_dir(filename: str = "questions.json") -> str:
+    """Return the directory holding the versions of `filename`."""
+    return f"{os.path.splitext(filename)[0]}_history"
+
+
+def _object_path(record_hash: str, filename: str) -> str:
+    return os.path.join(
+        history_dir(filename), "objects", record_hash[:2],
+        f"{record_hash}.json")
+
+
+def _manifest_path(version: int, filename: str) -> str:
+    return os.path.join(
+        history_dir(filename), "manifests", f"{version:06d}.json")
+
+
+def _write_atomic(path: str, data: str) -> None:
+    """Write `data` to `path` so readers never see a partial file."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(f"{path}.tmp", "w", encoding="UTF-8") as tmp_file:
+        tmp_file.write(data)
+    os.replace(f"{path}.tmp", path)
+
+
+@contextmanager
+def _file_lock(path: str) -> Iterator[None]:
+    """Hold an exclusive lock on `path` for threads and processes."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(f"{path}.lock", "a", encoding="UTF-8") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        yield
+
+
+def head_version(filename: str = "questions.json") -> Optional[int]:
+    """Return the latest version number or None if there is no history."""
+    try:
+        with open(os.path.join(history_dir(filename), "HEAD"),
+                  encoding="UTF-8") as head_file:
+            return int(head_file.read())
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def read_manifest(
+        version: int,
+        filename: str = "questions.json") -> Optional[dict]:
+    """Return the manifest of `version` or None if it doesn't exist."""
+    try:
+        with open(_manifest_path(version, filename),
+                  encoding="UTF-8") as manifest_file:
+            return json.load(manifest_file)
+    except FileNotFoundError:
+        logging.debug("Version %s of '%s' not found", version, filename)
+        return None
+
+
+def read_question(
+        record_hash: str,
+        filename: str = "questions.json") -> dict[str, str | list]:
+    """Return the stored question with `record_hash`."""
+    with open(_object_path(record_hash, filename),
+              encoding="UTF-8") as object_file:
+        return json.load(object_file)
+
+
+def snapshot_questions(
+        questions: list[dict[str, str | list]],
+        filename: str = "questions.json",
+        message: str = "") -> int:
+    """Record `questions` as a new version storing only new questions."""
+    hashes = [question_hash(question) for question in questions]
+    head = head_version(filename)
+    parent = read_manifest(head, filename) if head else None
+    parent_hashes = set(parent["records"]) if parent else set()
+    if parent and parent["records"] == hashes:
+        logging.debug("Version %s unchanged", head)
+        return head
+
+    written = 0
+    for record_hash, question in zip(hashes, questions):
+        if record_hash in parent_hashes:
+            continue
+        path = _object_path(record_hash, filename)
+        if not os.path.exists(path):
+            _write_atomic(path, json.dumps(question, ensure_ascii=False))
+            written += 1
+
+    version = (head or 0) + 1
+    new_hashes = set(hashes)
+    manifest = {
+        "version": version,
+        "parent": head,
+        "time": datetime.now().isoformat(timespec="seconds"),
+        "message": message,
+        "added": len(new_hashes - parent_hashes),
+        "removed": len(parent_hashes - new_hashes),
+        "records": hashes}
+    _write_atomic(_manifest_path(version, filename), json.dumps(manifest))
+    _write_atomic(os.path.join(history_dir(filename), "HEAD"), str(version))
+    logging.info("Saved version %s (%s new questions stored)",
+                 version, written)
+    return version
+
+
+def snapshot_file(
+        questions: list[dict[str, str | list]],
+        filename: str = "questions.json") -> int:
+    """Record the questions read from the file if they are a new version."""
+    message = ("Edited outside the game" if head_version(filename)
+               else "Initial version")
+    return snapshot_questions(questions, filename, message)
+
+
+def show_history(filename: str = "questions.json") -> None:
+    """List all versions of the questions, latest first."""
+    logging.info("Show history: %s", filename)
+    head = head_version(filename)
+    if head is None:
+        print("No versions saved yet")
+        return
+    for version in range(head, 0, -1):
+        manifest = read_manifest(version, filename)
+        if manifest is None:
+            continue
+        print(f"{version:>4} - {manifest['time']} - "
+              f"{len(manifest['records'])} questions "
+              f"(+{manifest['added']} -{manifest['removed']}) "
+              f"{manifest['message']}".rstrip())
+
+
+def diff_versions(
+        old: int,
+        new: Optional[int] = None,
+        filename: str = "questions.json") -> None:
+    """Print the questions removed (-) and added (+) from `old` to `new`."""
+    new = new or head_version(filename)
+    logging.info("Diff versions: %s %s", old, new)
+    old_manifest = read_manifest(old, filename)
+    new_manifest = read_manifest(new, filename) if new else None
+    if old_manifest is None or new_manifest is None:
+        exit(f"Version {old if old_manifest is None else new} not found")
+    old_hashes = set(old_manifest["records"])
+    new_hashes = set(new_manifest["records"])
+    # only the changed questions are read
+    for sign, hashes, manifest in (
+            ("-", old_hashes - new_hashes, old_manifest),
+            ("+", new_hashes - old_hashes, new_manifest)):
+        for record_hash in manifest["records"]:
+            if record_hash in hashes:
+                print(f"{sign} {read_question(record_hash, filename)['name']}")
+    if old_hashes == new_hashes:
+        print("No changes")
+
+
+def rollback(
+        version: int,
+        bank: Optional["QuestionBank"] = None) -> None:
+    """Restore the questions saved in `version` as a new version."""
+    logging.info("Rollback to version: %s", version)
+    bank = bank or QuestionBank()
+    manifest = read_manifest(version, bank.filename)
+    if manifest is None:
+        exit(f"Version {version} not found")
+    questions = [read_question(record_hash, bank.filename)
+                 for record_hash in manifest["records"]]
+    bank.save(questions, f"Rollback to version {version}")
+    print(f"Questions restored from version {version}")
+
+
+def _category_key(category: str) -> str:
+    return " ".join(category.casefold().split())
+
+
+def _question_categories(question: dict[str, str | list]) -> set[str]:
+    return {_category_key(key) for key in
+            [question.get("category", ""), *question.get("tags", [])]
+            if key}
+
+
+def _file_signature(filename: str) -> list[int]:
+    stat = os.stat(filename)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def _category_path(key: str, filename: str) -> str:
+    """Return the index file of one category (any name is a safe file)."""
+    return os.path.join(
+        history_dir(filename), "categories",
+        f"{hashlib.sha256(key.encode('UTF-8')).hexdigest()[:32]}.json")
+
+
+def build_category_index(
+        questions: list[dict[str, str | list]],
+        filename: str = "questions.json") -> dict[str, list]:
+    """Save one index file per category: [[position, hash], ...]."""
+    categories: dict[str, list] = {}
+    for poz, question in enumerate(questions):
+        keys = _question_categories(question)
+        if not keys:
+            continue
+        record_hash = question_hash(question)
+        for key in keys:
+            categories.setdefault(key, []).append([poz, record_hash])
+    index_dir = os.path.join(history_dir(filename), "categories")
+    paths = set()
+    for key, entries in categories.items():
+        path = _category_path(key, filename)
+        paths.add(path)
+        _write_atomic(path, json.dumps(entries))
+    for entry in os.scandir(index_dir) if os.path.isdir(index_dir) else []:
+        if entry.path not in paths and entry.name != "index.json":
+            os.remove(entry.path)
+    # written last: the category files match this version of the file
+    _write_atomic(os.path.join(index_dir, "index.json"),
+                  json.dumps({"file": _file_signature(filename)}))
+    logging.info("Indexed %s categories", len(categories))
+    return categories
+
+
+def category_questions(
+        category: str,
+        bank: Optional["QuestionBank"] = None) -> list[tuple[int, str]]:
+    """Return (position, hash) of every question in `category`."""
+    bank = bank or QuestionBank()
+    filename = bank.filename
+    key = _category_key(category)
+    try:
+        with open(os.path.join(history_dir(filename), "categories",
+                               "index.json"), encoding="UTF-8") as index_file:
+            if json.load(index_file)["file"] != _file_signature(filename):
+                raise ValueError("index is older than the file")
+    except (FileNotFoundError, json.JSONDecodeError, KeyError,
+            ValueError) as err:
+        # the file was edited by hand (or never saved): index it once
         logging.debug(err)
-        logging.warning("File '%s' not found", filename)
+        logging.warning("Rebuilding category index for '%s'", filename)
+        bank.invalidate()
+        questions = bank.load()
+        snapshot_file(questions, filename)
+        entries = build_category_index(questions, filename).get(key, [])
+    else:
+        # only the file of this category is read
+        try:
+            with open(_category_path(key, filename),
+                      encoding="UTF-8") as category_file:
+                entries = json.load(category_file)
+        except FileNotFoundError:
+            entries = []
+    return [tuple(entry) for entry in entries]
+
+
+def deck_path(
+        level: Annotated[int, range(1, 4)],
+        filename: str = "questions.json") -> str:
+    """Return the file holding the generated games for `level`."""
+    return os.path.join(history_dir(filename), "decks", f"level_{level}.deck")
+
+
+def build_deck(
+        level: Annotated[int, range(1, 4)],
+        games: int = DECK_GAMES,
+        bank: Optional["QuestionBank"] = None) -> None:
+    """Generate `games` ready to play games for `level`."""
+    logging.info("Build deck: level %s, %s games", level, games)
+    bank = bank or QuestionBank()
+    filename = bank.filename
+    # the deck must match the file, also after a hand edit
+    bank.invalidate()
+    questions = bank.load()
+    if len(questions) < ROUNDS:
+        raise NotEnoughQuestionsError("Not enough questions")
+    # games point to stored questions, so the current questions are stored
+    version = snapshot_file(questions, filename)
+    hashes = [bytes.fromhex(question_hash(question))
+              for question in questions]
+    data = bytearray(DECK_HEADER.pack(
+        b"QZDK", level, ROUNDS, version, *_file_signature(filename),
+        games, 0))
+    for _ in range(games):
+        for poz in random.sample(range(len(questions)), ROUNDS):
+            # answ_bad[level-1:level+2] as codes level..level+2
+            codes = [0, level, level + 1, level + 2]
+            random.shuffle(codes)
+            data += DECK_ROUND.pack(hashes[poz], *codes, codes.index(0))
+    path = deck_path(level, filename)
+    with _file_lock(path):
+        with open(f"{path}.tmp", "wb") as deck_file:
+            deck_file.write(data)
+        os.replace(f"{path}.tmp", path)
+
+
+def _refill_deck(
+        level: Annotated[int, range(1, 4)],
+        bank: "QuestionBank") -> None:
+    try:
+        build_deck(level, bank=bank)
+    except QuestionBankError as err:
+        logging.warning("Deck not refilled: %s", err)
+    finally:
+        _deck_refills.discard(level)
+
+
+def claim_game(
+        level: Annotated[int, range(1, 4)],
+        bank: Optional["QuestionBank"] = None
+        ) -> list[tuple[dict, list[str]]]:
+    """Take the next generated game for `level` as (question, variants)."""
+    logging.info("Claim game: level %s", level)
+    bank = bank or QuestionBank()
+    filename = bank.filename
+    game = None
+    path = deck_path(level, filename)
+    # other players (threads or processes) claim from the same deck
+    with _file_lock(path):
+        try:
+            with open(path, "r+b") as deck_file:
+                (_, _, rounds, version, mtime_ns, size, games,
+                 claimed) = DECK_HEADER.unpack(
+                     deck_file.read(DECK_HEADER.size))
+                # hand edits change the file but not the version
+                if (claimed < games and rounds == ROUNDS and
+                        version == head_version(filename) and
+                        [mtime_ns, size] == _file_signature(filename)):
+                    deck_file.seek(DECK_HEADER.size +
+                                   claimed * rounds * DECK_ROUND.size)
+                    game = deck_file.read(rounds * DECK_ROUND.size)
+                    deck_file.seek(0)
+                    deck_file.write(DECK_HEADER.pack(
+                        b"QZDK", level, rounds, version, mtime_ns, size,
+                        games, claimed + 1))
+                    remaining = games - claimed - 1
+        except (FileNotFoundError, struct.error) as err:
+            logging.debug(err)
+    if game is None:
+        # the deck is empty or the questions changed: never run dry
+        logging.warning("No generated game for level %s", level)
+        build_deck(level, bank=bank)
+        return claim_game(level, bank)
+    if remaining < DECK_REFILL_AT and level not in _deck_refills:
+        logging.info("Refill deck: level %s", level)
+        _deck_refills.add(level)
+        threading.Thread(target=_refill_deck, args=(level, bank)).start()
+
+    deck_rounds = []
+    for record_hash, *codes, _ in DECK_ROUND.iter_unpack(game):
+        question = read_question(record_hash.hex(), filename)
+        answers = [question["answ_good"], *question["answ_bad"]]
+        deck_rounds.append((question, [answers[code] for code in codes]))
+    return deck_rounds
+
+
+class LocalGameServer:
+    """In-process stand-in for a game server, used to load test the game."""
+
+    def __init__(self, questions: Sequence[dict[str, str | list]]) -> None:
+        if len(questions) < ROUNDS:
+            raise NotEnoughQuestionsError("Not enough questions")
+        self.questions = tuple(questions)
+        self._games: dict[int, dict] = {}
+        self._game_ids = count(1)
+        self._lock = threading.Lock()
+
+    def start_game(self, level: Annotated[int, range(1, 4)]) -> int:
+        """Start a game and return its id."""
+        with self._lock:
+            game_id = next(self._game_ids)
+            self._games[game_id] = {
+                "level": level,
+                "questions": draw_questions(self.questions),
+                "question": None,
+                "variants": [],
+                "score": 0}
+        return game_id
+
+    def next_question(self, game_id: int) -> tuple[str, list[str]]:
+        """Return the next question of the game and its variants."""
+        game = self._games[game_id]
+        game["question"] = game["questions"].pop()
+        game["variants"] = make_variants(game["question"], game["level"])
+        return game["question"]["name"], game["variants"]
+
+    def answer(
+            self,
+            game_id: int,
+            answer: Annotated[int, range(1, 5)]) -> bool:
+        """Score the answer to the current question of the game."""
+        game = self._games[game_id]
+        if check_answer(game["question"], game["variants"], answer):
+            game["score"] += 1
+            return True
+        return False
+
+    def end_game(self, game_id: int) -> int:
+        """End the game and return its score."""
+        with self._lock:
+            return self._games.pop(game_id)["score"]
+
+
+def load_test(
+        players: int = 100,
+        mode: str = "thread",
+        think_time: float = 0.0,
+        games: int = 1,
+        level: Optional[int] = None,
+        bank: Optional["QuestionBank"] = None) -> dict[str, dict[str, float]]:
+    """Play games with virtual players and report throughput and latency."""
+    logging.info("Load test: %s players (%s)", players, mode)
+    if players < 1 or games < 1:
+        raise ValueError("players and games must be at least 1")
+    questions = (bank or QuestionBank()).load()
+    start_time = time.perf_counter()
+    match mode:
+        case "thread":
+            latencies = _run_players(questions, players, think_time,
+                                     games, level)
+        case "asyncio":
+            latencies = asyncio.run(_run_async_players(
+                questions, players, think_time, games, level))
+        case "process":
+            workers = min(players, os.cpu_count() or 1)
+            shares = [players // workers + (worker < players % workers)
+                      for worker in range(workers)]
+            latencies = {"question": [], "answer": [], "game": []}
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                for worker_latencies in executor.map(
+                        _run_players, repeat(questions), shares,
+                        repeat(think_time), repeat(games), repeat(level)):
+                    for operation, values in worker_latencies.items():
+                        latencies[operation].extend(values)
+        case _:
+            raise ValueError(f"Unknown load test mode: {mode!r}")
+    elapsed = time.perf_counter() - start_time
+
+    played = len(latencies["game"])
+    print(f"{players} players ({mode}) played {played} games "
+          f"in {elapsed:.3f}s ({played / elapsed:.1f} games/s)")
+    report = {}
+    for operation, values in latencies.items():
+        if not values:
+            continue
+        percentiles = (quantiles(values, n=100, method="inclusive")
+                       if len(values) > 1 else values * 99)
+        report[operation] = {
+            "count": len(values),
+            "throughput": len(values) / elapsed,
+            "p50": percentiles[49] * 1000,
+            "p95": percentiles[94] * 1000,
+            "p99": percentiles[98] * 1000}
+        print(f"{operation:>8}: {len(values)} in {elapsed:.3f}s "
+              f"({report[operation]['throughput']:.0f}/s) - "
+              f"p50 {report[operation]['p50']:.3f}ms, "
+              f"p95 {report[operation]['p95']:.3f}ms, "
+              f"p99 {report[operation]['p99']:.3f}ms")
+    return report
+
+
+def _play_virtual_game(
+        server: LocalGameServer,
+        level: Optional[int],
+        latencies: dict[str, list[float]]):
+    """Play a game yielding the think time needed before each answer."""
+    game_start = time.perf_counter()
+    game_id = server.start_game(level or random.randint(1, 3))
+    for _ in range(ROUNDS):
+        start_time = time.perf_counter()
+        server.next_question(game_id)
+        latencies["question"].append(time.perf_counter() - start_time)
+        yield
+        start_time = time.perf_counter()
+        server.answer(game_id, random.randint(1, 4))
+        latencies["answer"].append(time.perf_counter() - start_time)
+    server.end_game(game_id)
+    latencies["game"].append(time.perf_counter() - game_start)
+
+
+def _think(think_time: float) -> float:
+    return random.uniform(0, 2 * think_time) if think_time else 0
+
+
+def _run_players(
+        questions: Sequence[dict[str, str | list]],
+        players: int,
+        think_time: float,
+        games: int,
+        level: Optional[int]) -> dict[str, list[float]]:
+    """Run each virtual player in a thread."""
+    server = LocalGameServer(questions)
+    latencies: dict[str, list[float]] = {
+        "question": [], "answer": [], "game": []}
+
+    def play() -> None:
+        for _ in range(games):
+            for _ in _play_virtual_game(server, level, latencies):
+                time.sleep(_think(think_time))
+
+    with ThreadPoolExecutor(max_workers=max(players, 1)) as executor:
+        futures = [executor.submit(play) for _ in range(players)]
+    # an error of any player fails the load test
+    for future in futures:
+        future.result()
+    return latencies
+
+
+async def _run_async_players(
+        questions: Sequence[dict[str, str | list]],
+        players: int,
+        think_time: float,
+        games: int,
+        level: Optional[int]) -> dict[str, list[float]]:
+    """Run each virtual player as an asyncio task."""
+    server = LocalGameServer(questions)
+    latencies: dict[str, list[float]] = {
+        "question": [], "answer": [], "game": []}
+
+    async def play() -> None:
+        for _ in range(games):
+            for _ in _play_virtual_game(server, level, latencies):
+                await asyncio.sleep(_think(think_time))
+
+    await asyncio.gather(*(play() for _ in range(players)))
+    return latencies
+
+
+class DifficultyIndex:
+    """Questions grouped in buckets of `BUCKET_SIZE` rating points."""
+
+    def __init__(self) -> None:
+        self._buckets: dict[int, list[str]] = {}
+        self._where: dict[str, tuple[int, int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._where)
+
+    def __contains__(self, record_hash: str) -> bool:
+        return record_hash in self._where
+
+    def add(self, record_hash: str, rating: float) -> None:
+        """Add the question or move it to the bucket of `rating`."""
+        bucket_no = int(rating // BUCKET_SIZE)
+        if record_hash in self._where:
+            if self._where[record_hash][0] == bucket_no:
+                return
+            self.remove(record_hash)
+        bucket = self._buckets.setdefault(bucket_no, [])
+        self._where[record_hash] = (bucket_no, len(bucket))
+        bucket.append(record_hash)
+
+    def remove(self, record_hash: str) -> None:
+        """Remove the question swapping it with the last in its bucket."""
+        bucket_no, poz = self._where.pop(record_hash)
+        bucket = self._buckets[bucket_no]
+        last = bucket.pop()
+        if last != record_hash:
+            bucket[poz] = last
+            self._where[last] = (bucket_no, poz)
+        if not bucket:
+            del self._buckets[bucket_no]
+
+    def pick(self, rating: float, exclude: set[str]) -> str:
+        """Return a random question from the bucket nearest to `rating`."""
+        target = int(rating // BUCKET_SIZE)
+        lowest, highest = min(self._buckets), max(self._buckets)
+        for distance in range(max(target - lowest, highest - target) + 1):
+            for bucket_no in {target - distance, target + distance}:
+                bucket = self._buckets.get(bucket_no, [])
+                # at most len(exclude) questions can't be picked
+                for _ in range(min(len(bucket), len(exclude) + 1)):
+                    record_hash = random.choice(bucket)
+                    if record_hash not in exclude:
+                        return record_hash
+                for record_hash in bucket:
+                    if record_hash not in exclude:
+                        return record_hash
+        raise LookupError("No question left to pick")
+
+
+class Ratings:
+    """Elo ratings of players and questions for adaptive games."""
+
+    def __init__(
+            self,
+            players: Optional[dict[str, list]] = None,
+            questions: Optional[dict[str, list]] = None) -> None:
+        # name / question hash -> [rating, number of answers]
+        self.players = players or {}
+        self.questions = questions or {}
+        self.index = DifficultyIndex()
+        # the ratings as loaded, so saving adds only the changes since
+        self._loaded = {"players": dict(self.players),
+                        "questions": dict(self.questions)}
+
+    @staticmethod
+    def path(filename: str = "questions.json") -> str:
+        """Return the file holding the ratings."""
+        return os.path.join(history_dir(filename), "ratings.json")
+
+    @classmethod
+    def load(cls, filename: str = "questions.json") -> "Ratings":
+        """Load the saved ratings or start with no ratings."""
+        try:
+            with open(cls.path(filename), encoding="UTF-8") as ratings_file:
+                ratings = json.load(ratings_file)
+            return cls(ratings["players"], ratings["questions"])
+        except (FileNotFoundError, json.JSONDecodeError, KeyError) as err:
+            logging.debug(err)
+            logging.info("No saved ratings for '%s'", filename)
+            return cls()
+
+    def save(self, filename: str = "questions.json") -> None:
+        """Add the changes of this game to the saved ratings."""
+        # other games may have saved their changes meanwhile
+        with _file_lock(self.path(filename)):
+            saved = Ratings.load(filename)
+            self.players = self._merge(
+                saved.players, self._loaded["players"], self.players)
+            self.questions = self._merge(
+                saved.questions, self._loaded["questions"], self.questions)
+            self._loaded = {"players": dict(self.players),
+                            "questions": dict(self.questions)}
+            questions = {record_hash: rating for record_hash, rating
+                         in self.questions.items()
+                         if not self.index or record_hash in self.index}
+            _write_atomic(self.path(filename), json.dumps(
+                {"players": self.players, "questions": questions},
+                separators=(",", ":")))
+
+    @staticmethod
+    def _merge(
+            saved: dict[str, list],
+            loaded: dict[str, list],
+            current: dict[str, list]) -> dict[str, list]:
+        merged = dict(saved)
+        for key, (rating, answers) in current.items():
+            old_rating, old_answers = loaded.get(key, [START_RATING, 0])
+            if [rating, answers] == [old_rating, old_answers]:
+                continue
+            saved_rating, saved_answers = saved.get(key, [START_RATING, 0])
+            merged[key] = [round(saved_rating + rating - old_rating, 1),
+                           saved_answers + answers - old_answers]
+        return merged
+
+    def index_questions(self, record_hashes: Iterable[str]) -> None:
+        """Add the questions to the difficulty index."""
+        for record_hash in record_hashes:
+            self.index.add(record_hash, self.difficulty(record_hash))
+
+    def skill(self, player: str) -> float:
+        """Return the rating of `player`."""
+        return self.players.get(player, [START_RATING, 0])[0]
+
+    def difficulty(self, record_hash: str) -> float:
+        """Return the rating of the question."""
+        return self.questions.get(record_hash, [START_RATING, 0])[0]
+
+    @staticmethod
+    def expected(
+            skill: float,
+            difficulty: float,
+            level: Annotated[int, range(1, 4)]) -> float:
+        """Return the chance of a correct answer (1 in 4 by guessing)."""
+        difficulty += LEVEL_STEP * (level - 1)
+        return 0.25 + 0.75 / (1 + 10 ** ((difficulty - skill) / 400))
+
+    def next_question(
+            self,
+            player: str,
+            exclude: set[str]) -> tuple[int, str]:
+        """Return the level and the question hash that fits `player`."""
+        skill = self.skill(player)
+        level = min(max(1 + int((skill - START_RATING) // LEVEL_STEP), 1), 3)
+        # difficulty answered correctly with a TARGET_CORRECT chance
+        difficulty = (skill - LEVEL_STEP * (level - 1) + 400 * math.log10(
+            0.75 / (TARGET_CORRECT - 0.25) - 1))
+        return level, self.index.pick(difficulty, exclude)
+
+    def update(
+            self,
+            player: str,
+            record_hash: str,
+            level: Annotated[int, range(1, 4)],
+            correct: bool) -> None:
+        """Update both ratings after `player` answered the question."""
+        skill, player_answers = self.players.get(player, [START_RATING, 0])
+        difficulty, question_answers = self.questions.get(
+            record_hash, [START_RATING, 0])
+        change = correct - self.expected(skill, difficulty, level)
+        self.players[player] = [
+            round(skill + _k_factor(player_answers) * change, 1),
+            player_answers + 1]
+        self.questions[record_hash] = [
+            round(difficulty - _k_factor(question_answers) * change, 1),
+            question_answers + 1]
+        self.index.add(record_hash, self.questions[record_hash][0])
+
+
+def _k_factor(answers: int) -> float:
+    """New ratings change fast and settle as more answers are given."""
+    return max(16.0, 64.0 / (1 + answers / 10))
+
+
+class QuestionWatcher:
+    """Keep the questions of a json file up to date while it is edited."""
+
+    def __init__(
+            self,
+            filename: str = "questions.json",
+            interval: float = 1.0,
+            schema_file: str = "json_schema.json") -> None:
+        self.filename = filename
+        self.interval = interval
+        self._validator = Draft4Validator(_read_json(schema_file)["items"])
+        self._signature: Optional[list[int]] = None
+        self._records: dict[str, dict[str, str | list]] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # games keep the tuple they got, so replacing it is enough
+        self.questions: tuple[dict[str, str | list], ...] = ()
+        with self._lock:
+            self._reload()
+
+    def check(self) -> bool:
+        """Reload the questions if the file changed since the last check."""
+        # called by the watching thread and by the game at the same time
+        with self._lock:
+            try:
+                return self._reload()
+            except BankNotFoundError as err:
+                logging.warning(err)
+            except QuestionBankError as err:
+                logging.debug(err.__cause__)
+                logging.critical(err)
+            return False
+
+    def _reload(self) -> bool:
+        try:
+            signature = _file_signature(self.filename)
+        except FileNotFoundError as err:
+            raise BankNotFoundError(
+                f"File '{self.filename}' not found") from err
+        if signature == self._signature:
+            return False
+        self._signature = signature
+        questions = _read_json(self.filename)
+        if not isinstance(questions, list):
+            raise BankValidationError(
+                f"There is invalid data in '{self.filename}'")
+
+        hashes = [question_hash(question) for question in questions]
+        # only new or edited questions need validating
+        problems = [(poz, problem) for poz, (record_hash, question)
+                    in enumerate(zip(hashes, questions))
+                    if record_hash not in self._records
+                    for problem in validate_question(
+                        question, self._validator)]
+        if problems:
+            for poz, problem in problems:
+                logging.debug("Question %s: %s", poz + 1, problem)
+            raise BankValidationError(
+                f"There is invalid data in '{self.filename}'")
+
+        records = {record_hash: self._records.get(record_hash, question)
+                   for record_hash, question in zip(hashes, questions)}
+        logging.info(
+            "Reloaded '%s': %s new, %s removed", self.filename,
+            len(records.keys() - self._records.keys()),
+            len(self._records.keys() - records.keys()))
+        self._records = records
+        self.questions = tuple(records[record_hash] for record_hash in hashes)
+        return True
+
+    def start(self) -> None:
+        """Check the file every `interval` seconds in the background."""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop checking the file."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def _watch(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.check()
+
+
+class QuestionBankError(Exception):
+    """Base class of the question bank errors."""
+
+
+class BankNotFoundError(QuestionBankError):
+    """The questions or the schema file doesn't exist."""
+
+
+class BankDecodeError(QuestionBankError):
+    """The questions or the schema file is not a correct json file."""
+
+
+class BankValidationError(QuestionBankError):
+    """The questions don't match the schema."""
+
+
+class QuestionNumberError(QuestionBankError):
+    """There is no question with this number."""
+
+
+class NotEnoughQuestionsError(QuestionBankError):
+    """There are fewer questions than the rounds of a game."""
+
+
+class QuestionBank:
+    """Questions of a json file, read once and kept in memory.
+
+    With `write_behind` every edit is saved to a journal before returning
+    and the file is rewritten in the background; `flush` waits for it.
+    Edits hold a lock file only while they read or change the journal and
+    writers take turns with another one, so several processes can share
+    the questions file and its journal.
+    """
+
+    def __init__(
+            self,
+            filename: str = "questions.json",
+            schema_file: str = "json_schema.json",
+            write_behind: bool = False) -> None:
+        self.filename = filename
+        self.schema_file = schema_file
+        self.write_behind = write_behind
+        self._schema: Optional[dict] = None
+        self._questions: Optional[list[dict[str, str | list]]] = None
+        # hash of the file content, to know which journal edits it has
+        self._file_hash = ""
+        # size and time of the files when last read or written by this bank
+        self._file_state: Optional[list[int]] = None
+        self._journal_state: Optional[list[int]] = None
+        self._seq = 0
+        self._pending: list[dict] = []
+        # taken after the write lock file and before the journal lock file
+        self._changed = threading.Condition(threading.RLock())
+        self._writer: Optional[threading.Thread] = None
+        self._write_error: Optional[QuestionBankError] = None
+        self._closed = False
+
+    def __len__(self) -> int:
+        return len(self._load())
+
+    def __enter__(self) -> "QuestionBank":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    @property
+    def schema(self) -> dict:
+        """The json schema of the questions file."""
+        if self._schema is None:
+            self._schema = _read_json(self.schema_file)
+        return self._schema
+
+    @property
+    def journal_file(self) -> str:
+        """The file holding the edits not yet saved to the questions file."""
+        return os.path.join(history_dir(self.filename), "journal.jsonl")
+
+    def load(self) -> list[dict[str, str | list]]:
+        """Return a copy of the questions, reading the file only once."""
+        with self._changed:
+            return list(self._load())
+
+    def invalidate(self) -> None:
+        """Read the files again the next time the questions are needed."""
+        logging.info("Invalidate questions: %s", self.filename)
+        self.flush()
+        with self._changed:
+            self._schema = None
+            self._questions = None
+
+    def question(self, question_no: int) -> dict[str, str | list]:
+        """Return question number `question_no` (first question is 1)."""
+        questions = self._load()
+        try:
+            question_index = validators.integer(
+                question_no - 1,
+                minimum=0,
+                maximum=len(questions) - 1)
+        except errors.MinimumValueError as err:
+            logging.debug("%s < minimum allowed (0)", question_no)
+            raise QuestionNumberError("Minimum question number is 1") from err
+        except errors.MaximumValueError as err:
+            logging.debug(
+                "%s > maximum allowed (%s)", question_no, len(questions))
+            raise QuestionNumberError(
+                f"Maximum question number is {len(questions)}") from err
+        return questions[question_index]
+
+    def add(self, question: dict[str, str | list]) -> None:
+        """Add `question` and save the file."""
+        message = f"Add question: {question['name']}"
+        # only the new question needs validating
+        self._validate([question], "Element was not validated")
+        if not self.write_behind:
+            with self._writing(), self._changed, self._locked():
+                self._sync()
+                self._save(self._questions + [question], message)
+            return
+        # never waits for the background writer
+        with self._changed, self._locked():
+            self._sync()
+            self._journal({"add": question, "message": message})
+            self._questions.append(question)
+
+    def delete(self, question_no: int) -> dict[str, str | list]:
+        """Delete question number `question_no`, save and return it."""
+        if not self.write_behind:
+            with self._writing(), self._changed, self._locked():
+                self._sync()
+                question = self.question(question_no)
+                questions = list(self._questions)
+                del questions[question_no - 1]
+                self._save(questions, f"Delete question: {question['name']}")
+            return question
+        with self._changed, self._locked():
+            self._sync()
+            question = self.question(question_no)
+            self._journal({"delete": question_no - 1,
+                           "hash": question_hash(question),
+                           "message": f"Delete question: {question['name']}"})
+            del self._questions[question_no - 1]
+        return question
+
+    def save(
+            self,
+            questions: list[dict[str, str | list]],
+            message: str = "") -> None:
+        """Save `questions` to the file and record a new version."""
+        logging.info("Saving json: %s", self.filename)
+        self._validate(questions, "Element was not validated")
+        if self.write_behind:
+            self.flush()
+        with self._writing(), self._changed, self._locked():
+            self._save(list(questions), message)
+
+    def flush(self) -> None:
+        """Wait until all the edits are saved to the questions file."""
+        with self._changed:
+            if not self._pending:
+                return
+            if not self.write_behind:
+                # edits recovered from the journal
+                questions = list(self._questions)
+                message = "; ".join(
+                    entry["message"] for entry in self._pending)
+        if not self.write_behind:
+            self.save(questions, message)
+            return
+        with self._changed:
+            self._write_error = None
+            self._start_writer()
+            self._changed.notify_all()
+            while not self._changed.wait_for(
+                    lambda: not self._pending or self._write_error,
+                    timeout=max(WRITE_DELAY, 0.01) * 10):
+                if not self._writer.is_alive():
+                    # started again by the next edit or flush
+                    self._writer = None
+                    raise QuestionBankError(f"File '{self.filename}' not "
+                                            "saved: the writer stopped")
+            if self._write_error:
+                raise self._write_error
+
+    def close(self) -> None:
+        """Save all the edits and stop the background writer."""
+        try:
+            self.flush()
+        finally:
+            with self._changed:
+                self._closed = True
+                self._changed.notify_all()
+            if self._writer:
+                self._writer.join()
+                self._writer = None
+
+    def _load(self) -> list[dict[str, str | list]]:
+        if self._questions is None:
+            with self._changed, self._locked():
+                self._sync()
+        return self._questions
+
+    def _locked(self):
+        """Lock the journal and the file state (threads and processes)."""
+        return _file_lock(self.journal_file)
+
+    def _writing(self):
+        """Lock writing the questions file (threads and processes)."""
+        return _file_lock(os.path.join(history_dir(self.filename), "write"))
+
+    def _sync(self) -> None:
+        """Read the files if they were changed since this bank used them."""
+        if (self._questions is not None and
+                _file_state(self.filename) == self._file_state and
+                _file_state(self.journal_file) == self._journal_state):
+            return
+        if self._questions is not None:
+            logging.info("File '%s' changed by another program",
+                         self.filename)
+        logging.info("Opening json: %s", self.filename)
+        state = _file_state(self.filename)
+        try:
+            with open(self.filename, "rb") as json_file:
+                data = json_file.read()
+            questions = json.loads(data)
+        except FileNotFoundError as err:
+            raise BankNotFoundError(
+                f"File '{self.filename}' not found") from err
+        except json.JSONDecodeError as err:
+            raise BankDecodeError(f"File '{self.filename}' is not "
+                                  "a correct json file") from err
+        self._validate(
+            questions, f"There is invalid data in '{self.filename}'")
+        self._file_hash = hashlib.sha256(data).hexdigest()
+        self._file_state = state
+        self._questions = questions
+        self._pending = []
+        self._recover()
+        self._journal_state = _file_state(self.journal_file)
+
+    def _save(
+            self,
+            questions: list[dict[str, str | list]],
+            message: str) -> None:
+        """Write `questions` and drop the journal (all locks are held)."""
+        try:
+            self._keep_first_version()
+            self._file_hash = self._write_file(questions)
+            os.replace(f"{self.filename}.tmp", self.filename)
+        except OSError as err:
+            raise self._not_saved(err) from err
+        # the cache matches the file even if recording the version fails
+        self._file_state = _file_state(self.filename)
+        self._questions = questions
+        self._pending = []
+        if os.path.exists(self.journal_file):
+            os.remove(self.journal_file)
+        self._journal_state = None
+        self._record(questions, message)
+
+    def _validate(
+            self,
+            questions: list[dict[str, str | list]],
+            message: str) -> None:
+        try:
+            validators.json(questions, self.schema)
+        except errors.JSONValidationError as err:
+            raise BankValidationError(message) from err
+
+    def _keep_first_version(self) -> None:
+        """Record the questions from before the first edit."""
+        if (head_version(self.filename) is None and
+                os.path.exists(self.filename)):
+            try:
+                snapshot_questions(_read_json(self.filename),
+                                   self.filename, "Initial version")
+            except BankDecodeError as err:
+                logging.debug(err)
+                logging.warning("Previous '%s' not versioned", self.filename)
+
+    def _write_file(self, questions: list[dict[str, str | list]]) -> str:
+        """Write the new file next to the old one and return its hash."""
+        data = json.dumps(questions, indent=2).encode("UTF-8")
+        try:
+            with open(f"{self.filename}.tmp", "wb") as json_file:
+                json_file.write(data)
+                json_file.flush()
+                os.fsync(json_file.fileno())
+        except FileNotFoundError as err:
+            raise BankNotFoundError(
+                f"File '{self.filename}' not found") from err
+        return hashlib.sha256(data).hexdigest()
+
+    def _record(
+            self,
+            questions: list[dict[str, str | list]],
+            message: str) -> None:
+        """Record a new version and index the categories of `questions`."""
+        try:
+            snapshot_questions(questions, self.filename, message)
+            build_category_index(questions, self.filename)
+        except (json.JSONDecodeError, KeyError) as err:
+            raise BankDecodeError(
+                f"History of '{self.filename}' is not correct") from err
+
+    def _append_journal(self, entry: dict) -> None:
+        os.makedirs(history_dir(self.filename), exist_ok=True)
+        with open(self.journal_file, "a", encoding="UTF-8") as journal:
+            journal.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            journal.flush()
+            os.fsync(journal.fileno())
+        self._journal_state = _file_state(self.journal_file)
+
+    def _journal(self, entry: dict) -> None:
+        """Save the edit to the journal and wake up the writer."""
+        if not self._pending and not os.path.exists(self.journal_file):
+            self._append_journal({"base": self._file_hash, "seq": self._seq})
+        self._seq += 1
+        entry["seq"] = self._seq
+        self._append_journal(entry)
+        self._pending.append(entry)
+        self._write_error = None
+        self._start_writer()
+        self._changed.notify_all()
+
+    def _read_journal(self) -> Optional[list[dict]]:
+        try:
+            with open(self.journal_file, encoding="UTF-8") as journal:
+                lines = journal.readlines()
+        except FileNotFoundError:
+            return None
+        entries = []
+        for line in lines:
+            try:
+                entries.append(json.loads(line))
+            except json.JSONDecodeError:
+                # the last edit was not saved completely
+                logging.debug("Skip journal line: %s", line)
+        return entries
+
+    def _recover(self) -> None:
+        """Apply the edits saved in the journal but not in the file."""
+        entries = self._read_journal()
+        if entries is None:
+            return
+        bases = [entry for entry in entries if "base" in entry and
+                 entry["base"] == self._file_hash]
+        if not bases:
+            logging.warning("Journal of '%s' doesn't match the file",
+                            self.filename)
+            os.remove(self.journal_file)
+            return
+        self._seq = bases[-1]["seq"]
+        pending = [entry for entry in entries
+                   if "base" not in entry and entry["seq"] > self._seq]
+        logging.log(logging.WARNING if pending else logging.INFO,
+                    "Recover %s edits of '%s'", len(pending), self.filename)
+        for entry in pending:
+            if "add" in entry:
+                self._questions.append(entry["add"])
+                continue
+            hashes = [question_hash(question)
+                      for question in self._questions]
+            if entry["hash"] in hashes:
+                index = entry["delete"]
+                if hashes[index:index + 1] != [entry["hash"]]:
+                    index = hashes.index(entry["hash"])
+                del self._questions[index]
+        self._seq = max([self._seq, *(entry["seq"] for entry in pending)])
+        # saved by the background writer or by the next flush
+        self._pending = pending
+        self._start_writer()
+
+    def _start_writer(self) -> None:
+        if self._writer is None and self.write_behind:
+            self._writer = threading.Thread(
+                target=self._write_behind, daemon=True)
+            self._writer.start()
+
+    def _write_behind(self) -> None:
+        """Save the edits to the file, a batch at a time."""
+        while True:
+            with self._changed:
+                self._changed.wait_for(lambda: self._closed or (
+                    self._pending and not self._write_error))
+                if self._closed:
+                    return
+            # let more edits arrive so they are written at once
+            time.sleep(WRITE_DELAY)
+            try:
+                with self._writing():
+                    self._write_batch()
+            # any error is reported by flush, the writer never dies
+            except Exception as err:
+                self._fail(err)
+
+    def _write_batch(self) -> None:
+        """Write the edits made so far while new edits go on."""
+        with self._changed, self._locked():
+            # another process may have written the edits already
+            self._sync()
+            if not self._pending:
+                self._changed.notify_all()
+                return
+            questions = list(self._questions)
+            seq = self._pending[-1]["seq"]
+            message = "; ".join(entry["message"] for entry in self._pending)
+        # the slow part: edits only wait for the locks held below
+        self._keep_first_version()
+        file_hash = self._write_file(questions)
+        with self._changed, self._locked():
+            shared = _file_state(self.journal_file) != self._journal_state
+            # the new file has all the journal edits up to `seq`
+            self._append_journal({"base": file_hash, "seq": seq})
+            os.replace(f"{self.filename}.tmp", self.filename)
+            self._file_hash = file_hash
+            self._file_state = _file_state(self.filename)
+            self._compact_journal(seq)
+            if shared:
+                # edits of another process: read them on the next edit
+                self._journal_state = None
+        try:
+            self._record(questions, message)
+        except Exception as err:
+            self._fail(err)
+        with self._changed:
+            self._pending = [entry for entry in self._pending
+                             if entry["seq"] > seq]
+            self._changed.notify_all()
+
+    def _fail(self, err: Exception) -> None:
+        logging.critical("Questions not saved: %s", err)
+        with self._changed:
+            self._write_error = (err if isinstance(err, QuestionBankError)
+                                 else self._not_saved(err))
+            self._changed.notify_all()
+
+    def _not_saved(self, err: Exception) -> QuestionBankError:
+        return QuestionBankError(f"File '{self.filename}' not saved: {err}")
+
+    def _compact_journal(self, seq: int) -> None:
+        """Keep in the journal only the edits after `seq` (not in the file)."""
+        _write_atomic(self.journal_file, "".join(
+            json.dumps(entry, ensure_ascii=False) + "\n" for entry in
+            [{"base": self._file_hash, "seq": seq},
+             *(entry for entry in self._read_journal() or []
+               if "base" not in entry and entry["seq"] > seq)]))
+        self._journal_state = _file_state(self.journal_file)
+
+
+def _file_state(filename: str) -> Optional[list[int]]:
+    """Return the modification time and size or None if there is no file."""
+    try:
+        return _file_signature(filename)
+    except FileNotFoundError:
+        return None
+
+
+def _read_json(filename: str):
+    """Return the content of a json file or raise a question bank error."""
+    try:
+        with open(filename, encoding="UTF-8") as json_file:
+            return json.load(json_file)
+    except FileNotFoundError as err:
+        raise BankNotFoundError(f"File '{filename}' not found") from err
     except json.JSONDecodeError as err:
-        logging.debug(err)
-        logging.warning("File '%s' is not a correct json file", json_file)
-    except errors.JSONValidationError as err:
-        logging.debug(err)
-        logging.critical("Element was not validated")
-    exit("Quit because of fatal error")
+        raise BankDecodeError(
+            f"File '{filename}' is not a correct json file") from err
 
 
 if __name__ == "__main__":
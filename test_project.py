@@ -3,14 +3,29 @@ import logging
 import os
 import random
 import shutil
+import threading
 
 import pytest
 from pytest import CaptureFixture, LogCaptureFixture, MonkeyPatch
 
-from project import (add_question, delete_question, list_questions, open_json,
-                  parse_args, play_game, save_json)
+import project
+from project import (DECK_HEADER, BankDecodeError, BankNotFoundError,
+                     BankValidationError, DifficultyIndex, LocalGameServer,
+                     NotEnoughQuestionsError, QuestionBank, QuestionBankError,
+                     QuestionNumberError, QuestionWatcher, Ratings,
+                     add_question, build_deck, category_questions, claim_game,
+                     deck_path, delete_question, diff_versions, head_version,
+                     history_dir, list_questions, load_test, open_json,
+                     parse_args, play_adaptive, play_game, question_hash,
+                     read_manifest, replay_games, rollback, save_json,
+                     show_history, validate_questions)
 
+GAME_DIR = os.path.dirname(os.path.abspath(__file__))
 TEST_FILE = "questions_test.json"
+ACTIONS = ("play", "list", "add", "delete", "validate", "history", "diff",
+           "rollback", "deck", "loadtest", "replay")
+USAGE = f"usage: pytest [-h] {{{','.join(ACTIONS)}}}"
+CHOICES = f"choose from {', '.join(map(repr, ACTIONS))}"
 VALID_QUESTION = [
     {"name": "Question",
      "answ_good": "Good answer",
@@ -29,7 +44,7 @@ def test_parse_args(capsys: CaptureFixture[str]):
     with pytest.raises(SystemExit):
         args = parse_args(["-h"])
     captured = capsys.readouterr()
-    assert "usage: pytest [-h] {play,list,add,delete}" in captured.out
+    assert USAGE in " ".join(captured.out.split())
     assert "Play the game and optionally specify a level" in captured.out
     assert "List all the questions in the game" in captured.out
     assert "Add a question to the game" in captured.out
@@ -37,7 +52,7 @@ def test_parse_args(capsys: CaptureFixture[str]):
     with pytest.raises(SystemExit):
         args = parse_args(["--help"])
     captured = capsys.readouterr()
-    assert "usage: pytest [-h] {play,list,add,delete}" in captured.out
+    assert USAGE in " ".join(captured.out.split())
     assert "Play the game and optionally specify a level" in captured.out
     assert "List all the questions in the game" in captured.out
     assert "Add a question to the game" in captured.out
@@ -47,13 +62,13 @@ def test_parse_args(capsys: CaptureFixture[str]):
     with pytest.raises(SystemExit):
         args = parse_args(["wrong"])
     captured = capsys.readouterr()
-    assert "usage: pytest [-h] {play,list,add,delete}" in captured.err
-    assert "choose from 'play', 'list', 'add', 'delete'" in captured.err
+    assert USAGE in " ".join(captured.err.split())
+    assert CHOICES in captured.err
     with pytest.raises(SystemExit):
         args = parse_args(["pla"])
     captured = capsys.readouterr()
-    assert "usage: pytest [-h] {play,list,add,delete}" in captured.err
-    assert "choose from 'play', 'list', 'add', 'delete'" in captured.err
+    assert USAGE in " ".join(captured.err.split())
+    assert CHOICES in captured.err
 
     # arg: play or no args
     args = parse_args()
@@ -72,8 +87,36 @@ def test_parse_args(capsys: CaptureFixture[str]):
     args = parse_args(["play", "--level", "3"])
     assert args.action == "play"
     assert args.level == 3
+    assert args.category is None
     with pytest.raises(AttributeError):
         args.question_no
+    args = parse_args(["play", "-c", "geography"])
+    assert args.level == 1
+    assert args.category == "geography"
+    assert not args.deck
+    args = parse_args(["play", "--deck"])
+    assert args.deck
+    with pytest.raises(SystemExit):
+        args = parse_args(["play", "-d", "-c", "geography"])
+    assert "not allowed with argument" in capsys.readouterr().err
+    assert args.seed is None
+    assert args.record is None
+    args = parse_args(["play", "-s", "42", "--record", "games.jsonl"])
+    assert args.seed == 42
+    assert args.record == "games.jsonl"
+    with pytest.raises(SystemExit):
+        args = parse_args(["play", "-d", "--seed", "42"])
+    assert ("argument -d/--deck: not allowed with argument -s/--seed"
+            in capsys.readouterr().err)
+    assert not args.adaptive
+    assert args.player == "player"
+    args = parse_args(["play", "--adaptive", "-p", "ann"])
+    assert args.adaptive
+    assert args.player == "ann"
+    with pytest.raises(SystemExit):
+        args = parse_args(["play", "-a", "-r", "games.jsonl"])
+    assert ("argument -a/--adaptive: not allowed with argument -s/--seed"
+            in capsys.readouterr().err)
     with pytest.raises(SystemExit):
         args = parse_args(["play", "-l", "4"])
     captured = capsys.readouterr()
@@ -88,6 +131,9 @@ def test_parse_args(capsys: CaptureFixture[str]):
     # arg: list
     args = parse_args(["list"])
     assert args.action == "list"
+    assert args.category is None
+    args = parse_args(["list", "--category", "geography"])
+    assert args.category == "geography"
     with pytest.raises(AttributeError):
         args.question_no
     with pytest.raises(AttributeError):
@@ -122,6 +168,93 @@ def test_parse_args(capsys: CaptureFixture[str]):
     assert "usage: pytest delete [-h] question_no" in captured.err
     assert "the following arguments are required: question_no" in captured.err
 
+    # arg: validate
+    args = parse_args(["validate"])
+    assert args.action == "validate"
+    assert args.jobs is None
+    assert args.chunk_size == 500
+    args = parse_args(["validate", "-j", "4", "--chunk-size", "100"])
+    assert args.jobs == 4
+    assert args.chunk_size == 100
+    for option in ("-j", "-c"):
+        for value in ("0", "-1"):
+            with pytest.raises(SystemExit):
+                parse_args(["validate", option, value])
+            assert "must be at least 1" in capsys.readouterr().err
+    with pytest.raises(AttributeError):
+        args.level
+
+    # arg: history, diff, rollback
+    args = parse_args(["history"])
+    assert args.action == "history"
+    args = parse_args(["diff", "1"])
+    assert args.action == "diff"
+    assert args.old == 1
+    assert args.new is None
+    args = parse_args(["diff", "1", "3"])
+    assert args.new == 3
+    args = parse_args(["rollback", "2"])
+    assert args.action == "rollback"
+    assert args.version == 2
+    with pytest.raises(SystemExit):
+        args = parse_args(["rollback"])
+    assert ("the following arguments are required: version"
+            in capsys.readouterr().err)
+
+    # arg: deck
+    args = parse_args(["deck"])
+    assert args.action == "deck"
+    assert args.level is None
+    assert args.games == 1000
+    args = parse_args(["deck", "-l", "2", "--games", "50"])
+    assert args.level == 2
+    assert args.games == 50
+
+    # arg: loadtest
+    args = parse_args(["loadtest"])
+    assert args.action == "loadtest"
+    assert (args.players, args.mode, args.think_time, args.games,
+            args.level) == (100, "thread", 0.0, 1, None)
+    args = parse_args(["loadtest", "-p", "5000", "-m", "asyncio",
+                       "--think-time", "0.5", "-g", "3", "-l", "2"])
+    assert (args.players, args.mode, args.think_time, args.games,
+            args.level) == (5000, "asyncio", 0.5, 3, 2)
+    with pytest.raises(SystemExit):
+        args = parse_args(["loadtest", "-m", "fork"])
+    assert "argument -m/--mode: invalid choice" in capsys.readouterr().err
+    for option in ("-p", "-g"):
+        with pytest.raises(SystemExit):
+            parse_args(["loadtest", option, "0", "-m", "process"])
+        assert "must be at least 1" in capsys.readouterr().err
+    with pytest.raises(SystemExit):
+        parse_args(["deck", "--games", "0"])
+    assert "must be at least 1" in capsys.readouterr().err
+
+    # arg: replay
+    args = parse_args(["replay", "games.jsonl"])
+    assert args.action == "replay"
+    assert args.replays == "games.jsonl"
+
+
+@pytest.fixture(autouse=True)
+def game_dir(tmp_path, monkeypatch: MonkeyPatch):
+    # saving records versions, so never save in the real game folder
+    for filename in ("json_schema.json", "questions.json"):
+        shutil.copyfile(os.path.join(GAME_DIR, filename), tmp_path / filename)
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def bank_dir(game_dir):
+    os.remove(game_dir / "questions.json")
+    return game_dir
+
+
+def make_questions(count: int) -> list[dict[str, str | list]]:
+    return [dict(VALID_QUESTION[0], name=f"Question {no}")
+            for no in range(count)]
+
 
 def test_open_json(capsys: CaptureFixture[str]):
     # file not found
@@ -412,6 +545,883 @@ def test_save_json_validation_error(
         assert "Quit because of fatal error" in capsys.readouterr().out
 
 
+def test_validate_questions(capsys: CaptureFixture[str]):
+    assert validate_questions()
+    captured = capsys.readouterr()
+    assert "Checked " in captured.out
+    assert "questions/s" in captured.out
+    assert "Found " not in captured.out
+
+
+@pytest.mark.parametrize("jobs", (1, 2))
+def test_validate_questions_errors(capsys: CaptureFixture[str], jobs):
+    questions_data = [
+        dict(VALID_QUESTION[0], name=f"Question {no}") for no in range(6)]
+    # empty name
+    questions_data[1] = dict(questions_data[1], name="")
+    # missing good answer
+    del questions_data[2]["answ_good"]
+    # good answer also a bad answer
+    questions_data[3] = dict(
+        questions_data[3],
+        answ_bad=["Good answer"] + VALID_QUESTION[0]["answ_bad"][1:])
+    # duplicate question
+    questions_data[5] = dict(questions_data[5], name=" question  0 ")
+    with open(TEST_FILE, "w", encoding="UTF-8") as json_file:
+        json.dump(questions_data, json_file, indent=2)
+    assert not validate_questions(TEST_FILE, jobs=jobs, chunk_size=2)
+    captured = capsys.readouterr()
+    assert ("   2 - $.name (items/properties/name/minLength): "
+            in captured.out)
+    assert ("   3 - $ (items/required): "
+            "'answ_good' is a required property" in captured.out)
+    assert ("   4 - $.answ_bad (answ_good-not-in-answ_bad): "
+            "'Good answer' is both a good and a bad answer" in captured.out)
+    assert ("   6 - $.name (unique-name): duplicate of question 1"
+            in captured.out)
+    assert "   1 - " not in captured.out
+    assert "   5 - " not in captured.out
+    assert "Checked 6 questions" in captured.out
+    assert "Found 4 problems in 4 questions" in captured.out
+    os.remove(TEST_FILE)
+
+
+def test_validate_questions_bad_options():
+    with pytest.raises(ValueError):
+        validate_questions(chunk_size=0)
+    with pytest.raises(ValueError):
+        validate_questions(jobs=0)
+
+
+def test_validate_questions_decode_error(capsys: CaptureFixture[str]):
+    with open(TEST_FILE, "w", encoding="UTF-8") as json_file:
+        json_file.write('[{"name": }]')
+    assert not validate_questions(TEST_FILE)
+    assert (f"File {TEST_FILE!r} is not a correct json file: line 1"
+            in capsys.readouterr().out)
+    os.remove(TEST_FILE)
+
+
+def count_objects() -> int:
+    return sum(len(files) for _, _, files in os.walk(
+        os.path.join(history_dir(TEST_FILE), "objects")))
+
+
+def test_versions(bank_dir, capsys: CaptureFixture[str]):
+    questions_data = make_questions(3)
+    with open(TEST_FILE, "w", encoding="UTF-8") as json_file:
+        json.dump(questions_data, json_file, indent=2)
+    assert head_version(TEST_FILE) is None
+
+    # first save also keeps the questions from before the edit
+    assert save_json(questions_data[:2], TEST_FILE, "Delete question")
+    assert head_version(TEST_FILE) == 2
+    assert read_manifest(1, TEST_FILE)["message"] == "Initial version"
+    assert count_objects() == 3
+
+    # saving the same questions doesn't add a version
+    assert save_json(questions_data[:2], TEST_FILE)
+    assert head_version(TEST_FILE) == 2
+
+    # only the new question is stored
+    new_question = dict(VALID_QUESTION[0], name="New question")
+    assert save_json(questions_data[:2] + [new_question], TEST_FILE, "Add")
+    assert head_version(TEST_FILE) == 3
+    assert count_objects() == 4
+    manifest = read_manifest(3, TEST_FILE)
+    assert (manifest["added"], manifest["removed"]) == (1, 0)
+
+    show_history(TEST_FILE)
+    captured = capsys.readouterr()
+    assert "   3 - " in captured.out
+    assert "3 questions (+1 -0) Add" in captured.out
+    assert "2 questions (+0 -1) Delete question" in captured.out
+    assert "3 questions (+3 -0) Initial version" in captured.out
+
+    diff_versions(1, filename=TEST_FILE)
+    captured = capsys.readouterr()
+    assert "- Question 2" in captured.out
+    assert "+ New question" in captured.out
+    assert "Question 0" not in captured.out
+    diff_versions(1, 1, TEST_FILE)
+    assert "No changes" in capsys.readouterr().out
+    with pytest.raises(SystemExit, match="Version 9 not found"):
+        diff_versions(9, filename=TEST_FILE)
+
+    # rollback reuses the stored questions
+    rollback(1, QuestionBank(TEST_FILE))
+    assert "Questions restored from version 1" in capsys.readouterr().out
+    assert open_json(TEST_FILE) == questions_data
+    assert head_version(TEST_FILE) == 4
+    assert read_manifest(4, TEST_FILE)["message"] == "Rollback to version 1"
+    assert count_objects() == 4
+    with pytest.raises(SystemExit, match="Version 9 not found"):
+        rollback(9, QuestionBank(TEST_FILE))
+
+
+def test_categories(
+        bank_dir,
+        capsys: CaptureFixture[str],
+        monkeypatch: MonkeyPatch):
+    questions_data = make_questions(15)
+    for question in questions_data[:8]:
+        question["category"] = "Geography"
+    for question in questions_data[8:11]:
+        question["category"] = "History"
+        question["tags"] = ["geography", "old"]
+    with open("questions.json", "w", encoding="UTF-8") as json_file:
+        json.dump(questions_data, json_file, indent=2)
+
+    # the index is built on first use
+    list_questions("GEOGRAPHY")
+    captured = capsys.readouterr()
+    for poz in range(11):
+        assert f"{poz + 1:>4} - Question {poz}\n" in captured.out
+    assert "Question 11" not in captured.out
+    # one small index file for each category and tag
+    assert len(os.listdir(os.path.join(
+        history_dir("questions.json"), "categories"))) == 4
+
+    # after that the whole file is never read
+    def no_full_load(*_):
+        raise AssertionError("full load")
+    monkeypatch.setattr(project, "open_json", no_full_load)
+    list_questions("old")
+    captured = capsys.readouterr()
+    assert "   9 - Question 8" in captured.out
+    assert "  11 - Question 10" in captured.out
+    assert "Question 0" not in captured.out
+
+    monkeypatch.setattr('builtins.input', lambda _: "1")
+    play_game(2, "geography")
+    captured = capsys.readouterr()
+    assert "Question 10/10" in captured.out
+    for poz in range(11, 15):
+        assert f"Question {poz}\n" not in captured.out
+    with pytest.raises(NotEnoughQuestionsError):
+        play_game(1, "history")
+    with pytest.raises(NotEnoughQuestionsError):
+        play_game(1, "unknown")
+
+    # saving keeps the index up to date
+    questions_data[14]["category"] = "History"
+    assert save_json(questions_data)
+    list_questions("history")
+    captured = capsys.readouterr()
+    assert "  15 - Question 14" in captured.out
+    assert "   1 - Question 0" not in captured.out
+
+
+def test_custom_paths(
+        bank_dir,
+        capsys: CaptureFixture[str],
+        monkeypatch: MonkeyPatch):
+    os.rename("json_schema.json", "schema.json")
+    questions_data = make_questions(12)
+    for question in questions_data:
+        question["category"] = "Geography"
+    write_questions(questions_data, "quiz.json")
+    bank = QuestionBank("quiz.json", "schema.json")
+
+    # every action reads the files of the bank
+    list_questions("geography", bank)
+    assert "  12 - Question 11" in capsys.readouterr().out
+    assert len(claim_game(1, bank)) == 10
+    assert load_test(players=2, bank=bank)["answer"]["count"] == 20
+    monkeypatch.setattr('builtins.input', lambda _: "1")
+    play_game(1, "geography", seed=3, record="games.jsonl", bank=bank)
+    assert replay_games("games.jsonl", bank)
+    capsys.readouterr()
+
+    # and raises instead of quitting
+    write_questions(questions_data[:9], "few.json")
+    few = QuestionBank("few.json", "schema.json")
+    with pytest.raises(NotEnoughQuestionsError):
+        build_deck(1, bank=few)
+    with pytest.raises(NotEnoughQuestionsError):
+        load_test(players=1, bank=few)
+    with pytest.raises(BankNotFoundError, match="'missing.json' not found"):
+        category_questions("geography", QuestionBank("missing.json"))
+
+
+def read_deck_header(level: int) -> tuple:
+    with open(deck_path(level), "rb") as deck_file:
+        return DECK_HEADER.unpack(deck_file.read(DECK_HEADER.size))
+
+
+def test_deck(bank_dir, monkeypatch: MonkeyPatch):
+    monkeypatch.setattr(project, "DECK_REFILL_AT", 0)
+    questions_data = make_questions(12)
+    with open("questions.json", "w", encoding="UTF-8") as json_file:
+        json.dump(questions_data, json_file, indent=2)
+
+    build_deck(2, games=3)
+    stat = os.stat("questions.json")
+    assert read_deck_header(2) == (
+        b"QZDK", 2, 10, 1, stat.st_mtime_ns, stat.st_size, 3, 0)
+    for claimed in range(1, 4):
+        deck_rounds = claim_game(2)
+        assert read_deck_header(2)[-1] == claimed
+        assert len(deck_rounds) == 10
+        assert len({question["name"] for question, _ in deck_rounds}) == 10
+        for question, variants in deck_rounds:
+            assert question in questions_data
+            assert sorted(variants) == sorted(
+                question["answ_bad"][1:4] + [question["answ_good"]])
+
+    # an empty deck is generated again
+    assert len(claim_game(2)) == 10
+    assert read_deck_header(2)[-2:] == (1000, 1)
+
+    # a deck for old questions is generated again
+    assert save_json(questions_data[1:])
+    deck_rounds = claim_game(2)
+    assert read_deck_header(2)[3] == head_version() == 2
+    assert read_deck_header(2)[-2:] == (1000, 1)
+    assert questions_data[0] not in [question for question, _ in deck_rounds]
+
+    # and so is a deck for questions edited by hand
+    with open("questions.json", "w", encoding="UTF-8") as json_file:
+        json.dump(questions_data[2:], json_file, indent=2)
+    deck_rounds = claim_game(2)
+    assert read_deck_header(2)[3] == head_version() == 3
+    assert read_deck_header(2)[-2:] == (1000, 1)
+    assert questions_data[1] not in [question for question, _ in deck_rounds]
+
+
+def test_deck_refill(bank_dir, monkeypatch: MonkeyPatch):
+    monkeypatch.setattr(project, "DECK_REFILL_AT", 4)
+    with open("questions.json", "w", encoding="UTF-8") as json_file:
+        json.dump(make_questions(10), json_file, indent=2)
+    build_deck(1, games=5)
+    claim_game(1)
+    assert read_deck_header(1)[-2:] == (5, 1)
+    claim_game(1)
+    for thread in threading.enumerate():
+        if thread is not threading.current_thread():
+            thread.join()
+    assert read_deck_header(1)[-2:] == (1000, 0)
+
+
+def test_play_game_deck(
+        bank_dir,
+        capsys: CaptureFixture,
+        monkeypatch: MonkeyPatch,
+        caplog: LogCaptureFixture):
+    caplog.set_level(logging.DEBUG)
+    monkeypatch.setattr(project, "DECK_REFILL_AT", 0)
+    with open("questions.json", "w", encoding="UTF-8") as json_file:
+        json.dump(make_questions(10), json_file, indent=2)
+    monkeypatch.setattr(
+        'builtins.input',
+        lambda _: caplog.record_tuples[-1][-1])
+    play_game(3, deck=True)
+    captured = capsys.readouterr()
+    assert "Question 10/10" in captured.out
+    assert "Final score: 10" in captured.out
+    assert "Bad answer 5" in captured.out
+    assert "Bad answer 2" not in captured.out
+    assert read_deck_header(3)[-1] == 1
+
+
+def write_questions(questions_data, filename: str = TEST_FILE) -> None:
+    with open(filename, "w", encoding="UTF-8") as json_file:
+        json.dump(questions_data, json_file, indent=2)
+    # make sure the change is seen even on coarse file times
+    stat = os.stat(filename)
+    os.utime(filename, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+
+def test_question_watcher(bank_dir, monkeypatch: MonkeyPatch):
+    questions_data = make_questions(5)
+    write_questions(questions_data)
+    watcher = QuestionWatcher(TEST_FILE)
+    game_questions = watcher.questions
+    assert list(game_questions) == questions_data
+    assert not watcher.check()
+
+    validated = []
+    validate_question = project.validate_question
+
+    def count_validated(question, validator):
+        validated.append(question)
+        return validate_question(question, validator)
+    monkeypatch.setattr(project, "validate_question", count_validated)
+
+    # only the changed question is validated
+    questions_data[2] = dict(questions_data[2], name="Changed")
+    write_questions(questions_data[:4])
+    assert watcher.check()
+    assert validated == [questions_data[2]]
+    assert list(watcher.questions) == questions_data[:4]
+    assert watcher.questions[0] is game_questions[0]
+    # a game in progress keeps its questions
+    assert list(game_questions) != list(watcher.questions)
+    assert len(game_questions) == 5
+
+    # invalid changes are not loaded
+    write_questions(questions_data + [dict(VALID_QUESTION[0], name="")])
+    assert not watcher.check()
+    assert list(watcher.questions) == questions_data[:4]
+    with open(TEST_FILE, "a", encoding="UTF-8") as json_file:
+        json_file.write("incorrect format")
+    assert not watcher.check()
+    assert list(watcher.questions) == questions_data[:4]
+
+    # the file is watched in the background
+    watcher.interval = 0.01
+    watcher.start()
+    write_questions(questions_data)
+    for _ in range(500):
+        if len(watcher.questions) == 5:
+            break
+        threading.Event().wait(0.01)
+    watcher.stop()
+    assert list(watcher.questions) == questions_data
+
+
+def test_question_watcher_invalid(bank_dir):
+    with pytest.raises(BankNotFoundError, match="not found"):
+        QuestionWatcher(TEST_FILE)
+    with open(TEST_FILE, "w", encoding="UTF-8") as json_file:
+        json_file.write("[{")
+    with pytest.raises(BankDecodeError, match="not a correct json file"):
+        QuestionWatcher(TEST_FILE)
+    write_questions([dict(VALID_QUESTION[0], name="")])
+    with pytest.raises(BankValidationError, match="invalid data"):
+        QuestionWatcher(TEST_FILE)
+
+
+def test_local_game_server():
+    server = LocalGameServer(make_questions(10))
+    game_id = server.start_game(2)
+    assert server.start_game(1) != game_id
+    for _ in range(10):
+        name, variants = server.next_question(game_id)
+        assert name.startswith("Question ")
+        assert sorted(variants) == sorted(
+            VALID_QUESTION[0]["answ_bad"][1:4] + ["Good answer"])
+        assert server.answer(game_id, variants.index("Good answer") + 1)
+    assert server.end_game(game_id) == 10
+    with pytest.raises(NotEnoughQuestionsError,
+                       match="Not enough questions"):
+        LocalGameServer(make_questions(9))
+
+
+@pytest.mark.parametrize("mode", ("thread", "asyncio", "process"))
+def test_load_test(capsys: CaptureFixture[str], mode):
+    report = load_test(players=20, mode=mode, think_time=0.001, games=2)
+    captured = capsys.readouterr()
+    assert f"20 players ({mode}) played 40 games in " in captured.out
+    assert "question: 400 in " in captured.out
+    assert "answer: 400 in " in captured.out
+    for operation in ("question", "answer"):
+        assert report[operation]["count"] == 400
+        assert report[operation]["throughput"] > 0
+        assert (0 <= report[operation]["p50"] <= report[operation]["p95"]
+                <= report[operation]["p99"])
+    with pytest.raises(ValueError):
+        load_test(players=0, mode=mode)
+    assert report["game"]["count"] == 40
+
+
+@pytest.mark.parametrize("mode", ("thread", "asyncio"))
+def test_load_test_errors(
+        capsys: CaptureFixture[str],
+        monkeypatch: MonkeyPatch,
+        mode):
+    def broken_answer(*_):
+        raise RuntimeError("server down")
+    monkeypatch.setattr(LocalGameServer, "answer", broken_answer)
+    with pytest.raises(RuntimeError, match="server down"):
+        load_test(players=5, mode=mode)
+    assert "played" not in capsys.readouterr().out
+
+
+def test_play_game_seed(
+        bank_dir,
+        capsys: CaptureFixture,
+        monkeypatch: MonkeyPatch):
+    write_questions(make_questions(30), "questions.json")
+    monkeypatch.setattr('builtins.input', lambda _: "2")
+    play_game(2, seed=7)
+    first_game = capsys.readouterr().out
+    play_game(2, seed=7)
+    assert capsys.readouterr().out == first_game
+    play_game(2, seed=8)
+    assert capsys.readouterr().out != first_game
+
+
+def test_replay_games(
+        bank_dir,
+        capsys: CaptureFixture,
+        monkeypatch: MonkeyPatch):
+    replays = "games.jsonl"
+    questions_data = make_questions(30)
+    for question in questions_data[:12]:
+        question["category"] = "geography"
+    write_questions(questions_data, "questions.json")
+    for answer in "1234":
+        monkeypatch.setattr('builtins.input', lambda _: answer)
+        play_game(3 if answer == "4" else 1, seed=int(answer),
+                  record=replays)
+    # a random seed is recorded when no seed is given
+    play_game(2, category="geography", record=replays)
+    monkeypatch.setattr('builtins.input', lambda _: "quit")
+    with pytest.raises(SystemExit, match="Game ended"):
+        play_game(1, seed=5, record=replays)
+    capsys.readouterr()
+
+    with open(replays, encoding="UTF-8") as replay_file:
+        games = [json.loads(line) for line in replay_file]
+    assert [game["answers"] for game in games] == [
+        "1" * 10, "2" * 10, "3" * 10, "4" * 10, "4" * 10, ""]
+    assert games[3]["level"] == 3
+    assert games[4]["category"] == "geography"
+    assert isinstance(games[4]["seed"], int)
+    assert games[5] == {"seed": 5, "version": 1, "level": 1,
+                        "answers": "", "score": 0}
+    # recording created the history once and changed nothing
+    assert head_version() == 1
+    assert read_manifest(1)["message"] == "Initial version"
+    assert replay_games(replays)
+    assert "Replayed 6 games in " in capsys.readouterr().out
+
+    # games are replayed with the questions they were played with
+    assert save_json(questions_data[::-1])
+    with monkeypatch.context() as patch:
+        def no_current_file(*_):
+            raise AssertionError("current file")
+        patch.setattr(project, "open_json", no_current_file)
+        assert replay_games(replays)
+        assert "0 mismatches" in capsys.readouterr().out
+    monkeypatch.setattr('builtins.input', lambda _: "1")
+    play_game(1, seed=1, record=replays)
+    play_game(1, category="geography", seed=1, record=replays)
+    capsys.readouterr()
+    with open(replays, encoding="UTF-8") as replay_file:
+        games = [json.loads(line) for line in replay_file]
+    assert [game["version"] for game in games[6:]] == [2, 2]
+    assert replay_games(replays)
+    assert "Replayed 8 games in " in capsys.readouterr().out
+
+    # answers must be 1-4 and the level 1-3
+    for wrong in ({"answers": "1230"}, {"answers": "5"},
+                  {"answers": "1" * 11}, {"level": 4}):
+        with open(replays, "w", encoding="UTF-8") as replay_file:
+            replay_file.write(json.dumps(dict(games[0], **wrong)) + "\n")
+        with pytest.raises(SystemExit, match="Line 1 of 'games.jsonl'"):
+            replay_games(replays)
+    with open(replays, "w", encoding="UTF-8") as replay_file:
+        replay_file.write(json.dumps(dict(games[0], version=9)) + "\n")
+    with pytest.raises(SystemExit, match="Version 9 not found"):
+        replay_games(replays)
+    games = games[:6]
+
+    # a score that doesn't match is reported
+    games[1]["score"] += 1
+    with open(replays, "w", encoding="UTF-8") as replay_file:
+        replay_file.writelines(json.dumps(game) + "\n" for game in games)
+        replay_file.write("not a replay\n")
+    with pytest.raises(SystemExit, match="Line 7 of 'games.jsonl'"):
+        replay_games(replays)
+    assert (f"     2 - recorded score {games[1]['score']}, replayed score "
+            f"{games[1]['score'] - 1}" in capsys.readouterr().out)
+    with open(replays, "w", encoding="UTF-8") as replay_file:
+        replay_file.writelines(json.dumps(game) + "\n" for game in games)
+    assert not replay_games(replays)
+    captured = capsys.readouterr()
+    assert "Replayed 6 games in " in captured.out
+    assert "1 mismatches" in captured.out
+
+
+def test_difficulty_index():
+    index = DifficultyIndex()
+    for no, rating in enumerate((1200, 1210, 1500, 1520, 1800)):
+        index.add(f"q{no}", rating)
+    assert len(index) == 5
+    assert index.pick(1505, set()) in {"q2", "q3"}
+    assert index.pick(1505, {"q2", "q3"}) in {"q0", "q1", "q4"}
+    assert index.pick(1790, set()) == "q4"
+    assert index.pick(2500, set()) == "q4"
+    assert index.pick(0, {"q0"}) == "q1"
+    index.add("q4", 1220)
+    assert len(index) == 5
+    assert index.pick(1790, {"q2", "q3"}) in {"q0", "q1", "q4"}
+    index.remove("q0")
+    assert "q0" not in index
+    assert "q1" in index
+    assert index.pick(1200, {"q1", "q4"}) in {"q2", "q3"}
+    with pytest.raises(LookupError):
+        index.pick(1500, {"q1", "q2", "q3", "q4"})
+
+
+def test_ratings():
+    ratings = Ratings()
+    ratings.index_questions(["easy", "hard"])
+    assert ratings.skill("ann") == 1500
+    assert ratings.expected(1500, 1500, 1) == pytest.approx(0.625)
+    assert ratings.expected(1500, 1500, 1) > ratings.expected(1500, 1500, 3)
+
+    ratings.update("ann", "easy", 1, True)
+    assert ratings.skill("ann") > 1500
+    assert ratings.difficulty("easy") < 1500
+    ratings.update("ann", "hard", 1, False)
+    assert ratings.difficulty("hard") > 1500
+    assert ratings.players["ann"][1] == 2
+    # the question is moved to the bucket of its new rating
+    assert ratings.index.pick(ratings.difficulty("hard"), set()) == "hard"
+
+    # better players get higher levels and harder questions
+    assert ratings.next_question("bob", set())[0] == 1
+    ratings.players["bob"] = [1850, 100]
+    assert ratings.next_question("bob", set()) == (3, "hard")
+    ratings.players["bob"] = [1350, 100]
+    assert ratings.next_question("bob", set()) == (1, "easy")
+    assert ratings.next_question("bob", {"easy"}) == (1, "hard")
+
+
+def test_ratings_shared(bank_dir):
+    # two games played at the same time
+    first = Ratings.load()
+    second = Ratings.load()
+    first.update("ann", "easy", 1, True)
+    second.update("bob", "easy", 1, False)
+    changes = first.difficulty("easy") + second.difficulty("easy") - 3000
+    first.save()
+    second.save()
+    saved = Ratings.load()
+    assert saved.players == {"ann": first.players["ann"],
+                             "bob": second.players["bob"]}
+    # both answers change the question rating
+    assert saved.questions["easy"][1] == 2
+    assert saved.difficulty("easy") == pytest.approx(1500 + changes)
+    assert second.difficulty("easy") == saved.difficulty("easy")
+    # saving again adds nothing twice
+    second.save()
+    assert Ratings.load().questions == saved.questions
+
+
+def test_play_adaptive(
+        bank_dir,
+        capsys: CaptureFixture,
+        monkeypatch: MonkeyPatch,
+        caplog: LogCaptureFixture):
+    caplog.set_level(logging.DEBUG)
+    questions_data = make_questions(20)
+    write_questions(questions_data, "questions.json")
+    monkeypatch.setattr(
+        'builtins.input',
+        lambda _: caplog.record_tuples[-1][-1])
+    play_adaptive("ann")
+    captured = capsys.readouterr()
+    assert "Skill rating of ann: 1500" in captured.out
+    assert "Question 1/10 (level 1/3)" in captured.out
+    assert "Final score: 10" in captured.out
+    assert "Perfect game!!!" in captured.out
+
+    # the ratings are kept for the next game
+    ratings = Ratings.load()
+    assert ratings.skill("ann") > 1600
+    assert ratings.players["ann"][1] == 10
+    assert len(ratings.questions) == 10
+    assert all(ratings.difficulty(question_hash(question)) <= 1500
+               for question in questions_data)
+    play_adaptive("ann")
+    captured = capsys.readouterr()
+    assert f"Skill rating of ann: {ratings.skill('ann'):.0f}" in captured.out
+    assert "(level 2/3)" in captured.out
+
+    monkeypatch.setattr('builtins.input', lambda _: "quit")
+    with pytest.raises(SystemExit, match="Game ended"):
+        play_adaptive("bob")
+    assert "Final score: 0" in capsys.readouterr().out
+    assert "bob" not in Ratings.load().players
+
+
+def test_question_bank(bank_dir):
+    os.rename("json_schema.json", "schema.json")
+    questions_data = make_questions(3)
+    write_questions(questions_data)
+    bank = QuestionBank(TEST_FILE, "schema.json")
+    assert bank.load() == questions_data
+    assert len(bank) == 3
+
+    # the file is read once
+    write_questions(make_questions(5))
+    assert len(bank) == 3
+    bank.load().append(VALID_QUESTION[0])
+    assert len(bank) == 3
+    bank.invalidate()
+    assert len(bank) == 5
+
+    assert bank.question(5)["name"] == "Question 4"
+    with pytest.raises(QuestionNumberError,
+                       match="Minimum question number is 1"):
+        bank.question(0)
+    with pytest.raises(QuestionNumberError,
+                       match="Maximum question number is 5"):
+        bank.question(6)
+
+    new_question = dict(VALID_QUESTION[0], name="New question")
+    bank.add(new_question)
+    assert bank.load()[-1] == new_question
+    assert bank.delete(1)["name"] == "Question 0"
+    assert [question["name"] for question in bank.load()] == [
+        "Question 1", "Question 2", "Question 3", "Question 4",
+        "New question"]
+    assert QuestionBank(TEST_FILE, "schema.json").load() == bank.load()
+    assert read_manifest(head_version(TEST_FILE), TEST_FILE)["message"] == (
+        "Delete question: Question 0")
+
+    with pytest.raises(BankValidationError,
+                       match="Element was not validated"):
+        bank.add(dict(VALID_QUESTION[0], name=""))
+    assert len(bank) == 5
+
+
+def test_question_bank_errors(bank_dir):
+    with pytest.raises(BankNotFoundError,
+                       match=f"File {TEST_FILE!r} not found"):
+        QuestionBank(TEST_FILE).load()
+    write_questions(VALID_QUESTION)
+    with pytest.raises(BankNotFoundError,
+                       match="File 'missing.json' not found"):
+        QuestionBank(TEST_FILE, "missing.json").load()
+    with open(TEST_FILE, "a", encoding="UTF-8") as json_file:
+        json_file.write("incorrect format")
+    with pytest.raises(BankDecodeError,
+                       match=f"File {TEST_FILE!r} is not a correct json"):
+        QuestionBank(TEST_FILE).load()
+    write_questions([dict(VALID_QUESTION[0], name="")])
+    with pytest.raises(BankValidationError,
+                       match=f"There is invalid data in {TEST_FILE!r}"):
+        QuestionBank(TEST_FILE).load()
+
+    # a damaged history is reported as a bank error too
+    bank = QuestionBank(TEST_FILE)
+    bank.save(make_questions(2))
+    manifest_path = os.path.join(history_dir(TEST_FILE), "manifests",
+                                 f"{head_version(TEST_FILE):06d}.json")
+    with open(manifest_path, encoding="UTF-8") as manifest_file:
+        good_manifest = manifest_file.read()
+    for no, manifest in enumerate(("{", '{"version": 1}')):
+        with open(manifest_path, "w", encoding="UTF-8") as manifest_file:
+            manifest_file.write(manifest)
+        with pytest.raises(BankDecodeError,
+                           match=f"History of {TEST_FILE!r} is not correct"):
+            bank.add(dict(VALID_QUESTION[0], name=f"Damaged {no}"))
+        # the question is saved and the bank knows it
+        assert bank.load() == read_questions()
+        assert bank.load()[-1]["name"] == f"Damaged {no}"
+    with open(manifest_path, "w", encoding="UTF-8") as manifest_file:
+        manifest_file.write(good_manifest)
+    bank.add(dict(VALID_QUESTION[0], name="Repaired"))
+    assert [question["name"] for question in read_questions()][2:] == [
+        "Damaged 0", "Damaged 1", "Repaired"]
+    assert bank.load() == read_questions()
+
+
+def read_questions(filename: str = TEST_FILE) -> list:
+    with open(filename, encoding="UTF-8") as json_file:
+        return json.load(json_file)
+
+
+def test_write_behind(bank_dir, monkeypatch: MonkeyPatch):
+    monkeypatch.setattr(project, "WRITE_DELAY", 0.2)
+    write_questions(make_questions(3))
+    writes = []
+    writing = threading.Event()
+    release = threading.Event()
+    write_file = QuestionBank._write_file
+
+    def slow_write(self, questions):
+        writes.append(questions)
+        writing.set()
+        release.wait()
+        return write_file(self, questions)
+    monkeypatch.setattr(QuestionBank, "_write_file", slow_write)
+
+    with QuestionBank(TEST_FILE, write_behind=True) as bank:
+        # edits don't wait for the file to be written
+        for no in range(3):
+            bank.add(dict(VALID_QUESTION[0], name=f"New question {no}"))
+        assert bank.delete(1)["name"] == "Question 0"
+        assert len(bank) == 5
+        assert len(read_questions()) == 3
+        # the edits not yet written are read from the journal
+        assert open_json(TEST_FILE) == bank.load()
+        with pytest.raises(BankValidationError):
+            bank.add(dict(VALID_QUESTION[0], name=""))
+        release.set()
+        bank.flush()
+        assert read_questions() == bank.load()
+        # edits made together are written together
+        assert len(writes) == 1
+        assert read_manifest(head_version(TEST_FILE),
+                             TEST_FILE)["message"].count("; ") == 3
+        assert bank.load()[-1]["name"] == "New question 2"
+
+        # edits don't wait for a write in progress
+        writing.clear()
+        release.clear()
+        bank.add(dict(VALID_QUESTION[0], name="Blocked write"))
+        assert writing.wait(5)
+        adding = threading.Thread(target=bank.add, args=(
+            dict(VALID_QUESTION[0], name="Last question"),))
+        adding.start()
+        adding.join(5)
+        assert not adding.is_alive()
+        assert bank.load()[-1]["name"] == "Last question"
+        assert open_json(TEST_FILE) == bank.load()
+        release.set()
+    assert read_questions()[-2:] == [
+        dict(VALID_QUESTION[0], name="Blocked write"),
+        dict(VALID_QUESTION[0], name="Last question")]
+    assert len(writes) == 3
+
+
+def test_write_behind_crash(bank_dir, monkeypatch: MonkeyPatch):
+    monkeypatch.setattr(project, "WRITE_DELAY", 0)
+    questions_data = make_questions(3)
+    write_questions(questions_data)
+    new_question = dict(VALID_QUESTION[0], name="New question")
+    replace = os.replace
+
+    def crash_replace(src, dst):
+        if dst == TEST_FILE:
+            raise OSError("disk full")
+        replace(src, dst)
+    monkeypatch.setattr(os, "replace", crash_replace)
+
+    bank = QuestionBank(TEST_FILE, write_behind=True)
+    bank.add(new_question)
+    bank.delete(2)
+    with pytest.raises(QuestionBankError, match="not saved: disk full"):
+        bank.flush()
+    assert read_questions() == questions_data
+
+    # the pending edits are in the journal
+    recovered = QuestionBank(TEST_FILE)
+    assert recovered.load() == [
+        questions_data[0], questions_data[2], new_question]
+    with pytest.raises(QuestionBankError, match="not saved: disk full"):
+        recovered.flush()
+    monkeypatch.setattr(os, "replace", replace)
+    recovered.flush()
+    assert read_questions() == recovered.load()
+    assert not os.path.exists(bank.journal_file)
+    bank.close()
+    assert read_questions() == recovered.load()
+
+
+def test_write_behind_crash_after_write(bank_dir, monkeypatch: MonkeyPatch):
+    monkeypatch.setattr(project, "WRITE_DELAY", 0)
+    questions_data = make_questions(3)
+    write_questions(questions_data)
+    replace = os.replace
+
+    def crash_replace(src, dst):
+        replace(src, dst)
+        if dst == TEST_FILE:
+            raise OSError("power cut")
+    monkeypatch.setattr(os, "replace", crash_replace)
+
+    bank = QuestionBank(TEST_FILE, write_behind=True)
+    bank.add(dict(VALID_QUESTION[0], name="New question"))
+    with pytest.raises(QuestionBankError):
+        bank.flush()
+    monkeypatch.setattr(os, "replace", replace)
+    # a torn line of an edit that was never finished
+    with open(bank.journal_file, "a", encoding="UTF-8") as journal:
+        journal.write('{"add": {"name": "Torn')
+
+    # edits already in the file are not added again
+    with QuestionBank(TEST_FILE, write_behind=True) as recovered:
+        assert len(recovered) == 4
+        assert recovered.load()[-1]["name"] == "New question"
+        recovered.delete(1)
+        recovered.flush()
+    assert len(read_questions()) == 3
+    assert QuestionBank(TEST_FILE).load() == read_questions()
+    bank.close()
+
+
+def test_shared_bank(bank_dir, monkeypatch: MonkeyPatch):
+    monkeypatch.setattr(project, "WRITE_DELAY", 0.3)
+    write_questions(make_questions(3))
+    # two banks stand for two processes using the same files
+    first = QuestionBank(TEST_FILE)
+    second = QuestionBank(TEST_FILE)
+    assert len(first) == len(second) == 3
+    first.add(dict(VALID_QUESTION[0], name="First"))
+    second.add(dict(VALID_QUESTION[0], name="Second"))
+    assert second.delete(1)["name"] == "Question 0"
+    first.add(dict(VALID_QUESTION[0], name="Third"))
+    assert [question["name"] for question in read_questions()] == [
+        "Question 1", "Question 2", "First", "Second", "Third"]
+
+    # edits in the shared journal are never lost or numbered twice
+    with QuestionBank(TEST_FILE, write_behind=True) as first, \
+            QuestionBank(TEST_FILE, write_behind=True) as second:
+        for no in range(5):
+            first.add(dict(VALID_QUESTION[0], name=f"First {no}"))
+            second.add(dict(VALID_QUESTION[0], name=f"Second {no}"))
+        with open(first.journal_file, encoding="UTF-8") as journal:
+            seqs = [entry["seq"] for entry in map(json.loads, journal)
+                    if "base" not in entry]
+        assert len(set(seqs)) == len(seqs) > 0
+        first.flush()
+        second.delete(1)
+        second.flush()
+    names = [question["name"] for question in read_questions()]
+    assert len(names) == 14
+    assert "Question 1" not in names
+    for no in range(5):
+        assert names.index(f"First {no}") < names.index(f"Second {no}")
+    assert QuestionBank(TEST_FILE).load() == read_questions()
+
+
+def test_write_behind_errors(bank_dir, monkeypatch: MonkeyPatch):
+    monkeypatch.setattr(project, "WRITE_DELAY", 0)
+    write_questions(make_questions(3))
+    write_file = QuestionBank._write_file
+
+    def broken_write(*_):
+        raise RuntimeError("broken")
+    monkeypatch.setattr(QuestionBank, "_write_file", broken_write)
+
+    bank = QuestionBank(TEST_FILE, write_behind=True)
+    bank.add(dict(VALID_QUESTION[0], name="New question"))
+    # any error of the writer is reported
+    with pytest.raises(QuestionBankError, match="not saved: broken"):
+        bank.flush()
+    monkeypatch.setattr(QuestionBank, "_write_file", write_file)
+    bank.flush()
+    assert len(read_questions()) == 4
+
+    # a writer that stopped is noticed instead of waited for
+    bank.close()
+    bank = QuestionBank(TEST_FILE, write_behind=True)
+    with monkeypatch.context() as patch:
+        patch.setattr(QuestionBank, "_write_behind", lambda _: None)
+        bank.add(dict(VALID_QUESTION[0], name="Last question"))
+        with pytest.raises(QuestionBankError, match="the writer stopped"):
+            bank.flush()
+    bank.close()
+    assert read_questions()[-1]["name"] == "Last question"
+
+
+def test_main_errors(
+        bank_dir,
+        monkeypatch: MonkeyPatch,
+        caplog: LogCaptureFixture):
+    monkeypatch.setattr(project, "argv", ["project.py", "list"])
+    with pytest.raises(SystemExit, match="Quit because of fatal error"):
+        project.main()
+    assert "File 'questions.json' not found" in caplog.messages
+
+
 def test_list_questions(capsys: CaptureFixture[str]):
     list_questions()
     captured = capsys.readouterr()